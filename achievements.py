@@ -0,0 +1,104 @@
+"""Event-driven achievements.
+
+Achievements are plain data: the run statistics they need and the
+thresholds to reach. Each one subscribes only to the engine events that
+can change those statistics, is evaluated only when such an event fires,
+and unsubscribes once unlocked, so nothing runs on a quiet tick.
+"""
+from engine import GameEvent
+
+# Engine events that can change each run statistic
+STAT_EVENTS = {
+    'score': GameEvent.SCORE_CHANGED,
+    'length': GameEvent.LENGTH_CHANGED,
+    'power_ups': GameEvent.POWER_UP_COLLECTED
+}
+
+ACHIEVEMENT_DEFINITIONS = [
+    {'name': 'Speed Demon', 'description': 'Score 100 points in under 60 seconds',
+     'requires': {'score': 100}, 'within_seconds': 60},
+    {'name': 'Snake Master', 'description': 'Reach a length of 20',
+     'requires': {'length': 20}},
+    {'name': 'Power Player', 'description': 'Collect 5 power-ups',
+     'requires': {'power_ups': 5}},
+    {'name': 'High Scorer', 'description': 'Score 500 points',
+     'requires': {'score': 500}}
+]
+
+
+class Achievement:
+    def __init__(self, name, description, requires, within_seconds=None):
+        self.name = name
+        self.description = description
+        self.unlocked = False
+        self.requires = requires
+        self.within_seconds = within_seconds
+        self.events = {STAT_EVENTS[stat] for stat in requires}
+
+    def condition(self, stats):
+        if self.within_seconds is not None and stats['seconds'] > self.within_seconds:
+            return False
+        return all(stats[stat] >= minimum for stat, minimum in self.requires.items())
+
+
+def create_achievements(definitions=ACHIEVEMENT_DEFINITIONS):
+    achievements = {}
+    for definition in definitions:
+        achievement = Achievement(definition['name'], definition['description'],
+                                  definition['requires'], definition.get('within_seconds'))
+        achievements[achievement.name] = achievement
+    return achievements
+
+
+class AchievementTracker:
+    def __init__(self, achievements, on_unlock=None):
+        self.achievements = achievements
+        self.on_unlock = on_unlock
+        self.subscribers = {}
+        self.engine = None
+        self.observer = None
+        self.stats = {}
+        for achievement in achievements.values():
+            if not achievement.unlocked:
+                self.subscribe(achievement)
+
+    def subscribe(self, achievement):
+        for event in achievement.events:
+            self.subscribers.setdefault(event, []).append(achievement)
+
+    def unsubscribe(self, achievement):
+        for event in achievement.events:
+            self.subscribers[event].remove(achievement)
+            if not self.subscribers[event]:
+                del self.subscribers[event]
+
+    def start_run(self, engine):
+        # Register as an observer of a freshly reset engine
+        self.engine = engine
+        self.stats = {'score': 0, 'length': 1, 'power_ups': 0, 'seconds': 0}
+        # Looked up per event, so a profiler can wrap on_game_event mid-run
+        self.observer = lambda event, state: self.on_game_event(event, state)
+        engine.add_observer(self.observer)
+
+    def stop_run(self):
+        # Stop tracking the current run, e.g. once a bot takes over
+        if self.engine is not None:
+            self.engine.remove_observer(self.observer)
+            self.engine = None
+
+    def on_game_event(self, event, state):
+        achievements = self.subscribers.get(event)
+        if event == GameEvent.POWER_UP_COLLECTED:
+            self.stats['power_ups'] += 1
+        if not achievements:
+            return
+
+        self.stats['score'] = state.score
+        self.stats['length'] = state.length_of_snake
+        self.stats['seconds'] = self.engine.elapsed(state)
+        for achievement in achievements[:]:
+            if achievement.condition(self.stats):
+                achievement.unlocked = True
+                self.unsubscribe(achievement)
+                if self.on_unlock:
+                    self.on_unlock(achievement)
@@ -0,0 +1,80 @@
+"""Sound effects with preloaded samples and reserved mixer channels.
+
+Every ``.wav`` in the package's ``assets/`` directory is decoded once, on a
+background thread. Each sound category plays on its own reserved channel,
+so a burst of eat sounds replaces itself instead of piling up, and never
+cuts off the death sound. A disabled engine (or one whose mixer failed to
+start) turns ``play`` into a no-op.
+"""
+import threading
+from pathlib import Path
+
+import pygame
+
+ASSET_DIR = Path(__file__).resolve().parent / "assets"
+
+# Sound name -> channel category
+SOUND_CATEGORIES = {
+    'eat': 'pickup',
+    'move': 'move',
+    'die': 'event',
+    'draw': 'event',
+    'win': 'fanfare',
+    'highscore': 'fanfare'
+}
+CATEGORIES = ['pickup', 'move', 'event', 'fanfare']
+
+
+class AudioEngine:
+    def __init__(self, enabled=True, asset_dir=ASSET_DIR, volume=0.75, background=True):
+        self.asset_dir = Path(asset_dir)
+        self.volume = volume
+        self.sounds = {}
+        self.channels = {}
+        self.enabled = enabled and self.init_mixer()
+        self.loader = None
+        if not self.enabled:
+            return
+
+        pygame.mixer.set_reserved(len(CATEGORIES))
+        for i, category in enumerate(CATEGORIES):
+            self.channels[category] = pygame.mixer.Channel(i)
+
+        if background:
+            self.loader = threading.Thread(target=self.load_sounds, name="AudioLoader", daemon=True)
+            self.loader.start()
+        else:
+            self.load_sounds()
+
+    def init_mixer(self):
+        if pygame.mixer.get_init():
+            return True
+        try:
+            pygame.mixer.init()
+            return True
+        except pygame.error as e:
+            print(f"Warning: audio disabled - {str(e)}")
+            return False
+
+    def load_sounds(self):
+        for path in sorted(self.asset_dir.glob("*.wav")):
+            try:
+                sound = pygame.mixer.Sound(str(path))
+            except pygame.error as e:
+                print(f"Warning: could not load {path.name} - {str(e)}")
+                continue
+            sound.set_volume(self.volume)
+            self.sounds[path.stem] = sound
+
+    def wait_loaded(self):
+        if self.loader:
+            self.loader.join()
+
+    def play(self, name):
+        if not self.enabled:
+            return
+        # Sounds still decoding in the background are skipped rather than waited on
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        self.channels[SOUND_CATEGORIES.get(name, 'event')].play(sound)
@@ -0,0 +1,259 @@
+"""Autopilot that plays the engine without a keyboard.
+
+Neighbours and positions along the Hamiltonian cycle (when the board has
+one) are computed arithmetically, so creating a bot costs nothing per cell.
+
+* On boards without obstacles the bot follows the Hamiltonian cycle and
+  takes shortcuts towards the food that never overtake its own tail, which
+  is O(1) per tick and cannot trap the snake.
+* With obstacles (or no cycle) it grows a breadth-first search tree out
+  from the food, a bounded number of cells per tick, and steps to the
+  neighbour closest to the food once the tree reaches the head. The tree
+  stays valid while the food stays put, so it is only rebuilt when the
+  food moves or the next step is blocked. Until then, or when the food is
+  unreachable, it takes the move with the most room, counting no further
+  than twice the snake's length, and breaks ties towards the food.
+
+Search buffers are allocated once and reused with a generation stamp.
+"""
+from array import array
+from collections import deque
+
+from engine import OPPOSITE_DIRECTIONS, Direction, ItemKind
+
+# Shortcuts must leave this many cells between the head and tail
+SHORTCUT_MARGIN = 3
+# Cells added to the search tree per tick; bounds the cost of one decision
+SEARCH_BUDGET = 1000
+# Ticks to wait before searching again for food that could not be reached
+RETRY_TICKS = 5
+
+
+class Autopilot:
+    def __init__(self, engine):
+        self.engine = engine
+        self.cols = engine.cols
+        self.rows = engine.rows
+        self.num_cells = engine.cols * engine.rows
+
+        # Rows or columns of even length to run the cycle along, or None if
+        # the board has no simple one (both sides odd, or a single row/column)
+        self.cycle = None
+        if self.cols >= 2 and self.rows >= 2:
+            if self.rows % 2 == 0:
+                self.cycle = 'rows'
+            elif self.cols % 2 == 0:
+                self.cycle = 'columns'
+
+        self.obstacles_source = None
+        # Search tree grown from search_target: seen stamps and distance to the target
+        self.search_target = None
+        self.search_stamp = 0
+        self.frontier = deque()
+        self.retry_tick = 0
+        self.last_distance = None
+
+        # Reusable search buffers
+        self.seen = array('q', [0]) * self.num_cells
+        self.distance = array('i', [0]) * self.num_cells
+        self.visited = array('q', [0]) * self.num_cells
+        self.generation = 0
+
+    def neighbors(self, index):
+        # (direction, cell index) for the four cells around index, across the wrap-around edges
+        cols = self.cols
+        x = index % cols
+        row = index - x
+        return ((Direction.UP, (index - cols) % self.num_cells),
+                (Direction.RIGHT, row + (x + 1) % cols),
+                (Direction.DOWN, (index + cols) % self.num_cells),
+                (Direction.LEFT, row + (x - 1) % cols))
+
+    def cells_around(self, index):
+        # The neighbours without their directions, for the search loops
+        cols = self.cols
+        x = index % cols
+        row = index - x
+        return ((index - cols) % self.num_cells, row + (x + 1) % cols,
+                (index + cols) % self.num_cells, row + (x - 1) % cols)
+
+    def moves(self, state, head):
+        # Neighbours of the head the snake can turn to; the engine ignores a reversal
+        back = OPPOSITE_DIRECTIONS.get(state.direction)
+        return [(direction, index) for direction, index in self.neighbors(head) if direction is not back]
+
+    def cycle_position(self, index):
+        # Boustrophedon over columns 1.. of each row, returning up column 0
+        # (or the same over columns, when only the column count is even)
+        x, y = index % self.cols, index // self.cols
+        width, height = self.cols, self.rows
+        if self.cycle == 'columns':
+            x, y, width, height = y, x, height, width
+        if x == 0:
+            return (width - 1) * height + height - y if y else 0
+        return 1 + y * (width - 1) + (x - 1 if y % 2 == 0 else width - 1 - x)
+
+    def sync_obstacles(self, state):
+        # A new run (or a new level) starts a new search
+        if self.obstacles_source is not state.obstacles:
+            self.obstacles_source = state.obstacles
+            self.search_target = None
+            self.retry_tick = 0
+
+    def is_blocked(self, state, index, tail_index):
+        if state.blocked[index] == 0:
+            return False
+        if state.items.get(index) is ItemKind.OBSTACLE:
+            return True
+        if state.occupancy[index] == 0:
+            # Food and power-ups
+            return False
+        # The tail moves out of the way unless the snake is still growing
+        return index != tail_index or len(state.snake_list) < state.length_of_snake
+
+    def choose(self, state):
+        self.sync_obstacles(state)
+        head = self.engine.cell_index(state.head)
+        tail = self.engine.cell_index(state.snake_list[0])
+
+        if self.cycle and not state.obstacles:
+            move = self.cycle_move(state, head, tail)
+            if move:
+                return move
+
+        move = self.path_move(state, head, tail)
+        if move:
+            return move
+        return self.roomiest_move(state, head, tail)
+
+    def cycle_move(self, state, head, tail):
+        position = self.cycle_position
+        n = self.num_cells
+        head_position = position(head)
+        tail_distance = (position(tail) - head_position) % n if len(state.snake_list) > 1 else n
+        food_distance = (n if state.food is None else
+                         (position(self.engine.cell_index(state.food)) - head_position) % n)
+
+        best = None
+        best_distance = 0
+        for direction, index in self.moves(state, head):
+            if self.is_blocked(state, index, tail):
+                continue
+            distance = (position(index) - head_position) % n
+            if distance == 1 and best is None:
+                best, best_distance = direction, distance
+            shortcuts = state.length_of_snake < n // 2
+            if (shortcuts and best_distance < distance <= food_distance and
+                    distance < tail_distance - SHORTCUT_MARGIN):
+                best, best_distance = direction, distance
+        return best
+
+    def path_move(self, state, head, tail):
+        if state.food is None:
+            return None
+        food = self.engine.cell_index(state.food)
+        if self.search_target != food:
+            self.start_search(food)
+
+        move = self.tree_move(state, head, tail)
+        if move is None and self.last_distance is not None:
+            # The next step got blocked: the tree is stale
+            self.start_search(food)
+        elif move is not None:
+            return move
+
+        if not self.frontier:
+            if state.tick < self.retry_tick:
+                return None
+            self.start_search(food)
+        self.grow_search(state, head, tail)
+        if not self.frontier:
+            self.retry_tick = state.tick + RETRY_TICKS
+        return self.tree_move(state, head, tail)
+
+    def tree_move(self, state, head, tail):
+        # Step to the free neighbour of the head that is closest to the food
+        stamp, seen, distance = self.search_stamp, self.seen, self.distance
+        best = best_index = None
+        best_distance = self.last_distance
+        for direction, index in self.moves(state, head):
+            if (seen[index] == stamp and (best_distance is None or distance[index] < best_distance)
+                    and not self.is_blocked(state, index, tail)):
+                best, best_index, best_distance = direction, index, distance[index]
+        if best is None:
+            return None
+        if self.last_distance is None:
+            # Only commit if the first step leaves room for the whole snake
+            if self.room(state, best_index, tail, state.length_of_snake) < state.length_of_snake:
+                return None
+        self.last_distance = best_distance
+        return best
+
+    def start_search(self, food):
+        self.search_target = food
+        self.last_distance = None
+        self.search_stamp = stamp = self.next_generation()
+        self.seen[food] = stamp
+        self.distance[food] = 0
+        self.frontier = deque([food])
+
+    def grow_search(self, state, head, tail):
+        # Breadth-first from the food, at most SEARCH_BUDGET cells this tick,
+        # stopping once the tree touches the head
+        stamp, seen, distance = self.search_stamp, self.seen, self.distance
+        frontier = self.frontier
+        reached = False
+        for _ in range(SEARCH_BUDGET):
+            if not frontier or reached:
+                break
+            index = frontier.popleft()
+            next_distance = distance[index] + 1
+            for neighbor in self.cells_around(index):
+                if neighbor == head:
+                    reached = True
+                elif seen[neighbor] != stamp and not self.is_blocked(state, neighbor, tail):
+                    seen[neighbor] = stamp
+                    distance[neighbor] = next_distance
+                    frontier.append(neighbor)
+
+    def next_generation(self):
+        self.generation += 1
+        return self.generation
+
+    def room(self, state, start, tail, limit):
+        # Reachable free cells from start, counting no further than limit
+        stamp = self.next_generation()
+        visited = self.visited
+        visited[start] = stamp
+        queue = deque([start])
+        count = 0
+        while queue and count < limit:
+            index = queue.popleft()
+            count += 1
+            for neighbor in self.cells_around(index):
+                if visited[neighbor] != stamp and not self.is_blocked(state, neighbor, tail):
+                    visited[neighbor] = stamp
+                    queue.append(neighbor)
+        return count
+
+    def food_distance(self, state, index):
+        # Wrap-around Manhattan distance from a cell to the food
+        if state.food is None:
+            return 0
+        x, y = self.engine.cell_at(index)
+        dx, dy = abs(x - state.food[0]), abs(y - state.food[1])
+        return min(dx, self.cols - dx) + min(dy, self.rows - dy)
+
+    def roomiest_move(self, state, head, tail):
+        # Beyond twice the snake's length more room makes no difference;
+        # among moves with equal room, head for the food
+        limit = 2 * state.length_of_snake
+        best = None
+        best_key = None
+        for direction, index in self.moves(state, head):
+            if self.is_blocked(state, index, tail):
+                continue
+            key = (self.room(state, index, tail, limit), -self.food_distance(state, index))
+            if best_key is None or key > best_key:
+                best, best_key = direction, key
+        return best
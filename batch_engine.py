@@ -0,0 +1,166 @@
+"""Vectorized NumPy engine that steps many snake games at once.
+
+``BatchEngine`` holds N independent games in flat arrays and advances all
+of them with a single ``step(actions)`` call. It follows the movement,
+wrap-around, food and obstacle rules of ``engine.Engine``; power-ups and
+the time-trial clock are not modelled here. Requires NumPy.
+"""
+import numpy as np
+
+from engine import GameMode
+
+NO_ACTION = -1
+
+# Indexed by engine.Direction values (UP, RIGHT, DOWN, LEFT)
+DX = np.array([0, 1, 0, -1], dtype=np.int32)
+DY = np.array([-1, 0, 1, 0], dtype=np.int32)
+
+
+class BatchEngine:
+    def __init__(self, num_envs, cols, rows, game_mode=GameMode.CLASSIC,
+                 obstacle_count=5, seed=None):
+        self.num_envs = num_envs
+        self.cols = cols
+        self.rows = rows
+        self.num_cells = cols * rows
+        self.game_mode = game_mode
+        self.obstacle_count = obstacle_count
+        self.rng = np.random.default_rng(seed)
+
+        n = num_envs
+        self.env_ids = np.arange(n)
+        self.head_x = np.zeros(n, dtype=np.int32)
+        self.head_y = np.zeros(n, dtype=np.int32)
+        self.direction = np.full(n, NO_ACTION, dtype=np.int8)
+        # Ring-buffer bodies of flat cell indices, oldest segment at body_tail
+        self.body = np.zeros((n, self.num_cells), dtype=np.int32)
+        self.body_tail = np.zeros(n, dtype=np.int32)
+        self.body_count = np.zeros(n, dtype=np.int32)
+        self.length = np.ones(n, dtype=np.int32)
+        self.occupancy = np.zeros((n, self.num_cells), dtype=bool)
+        self.obstacles = np.zeros((n, self.num_cells), dtype=bool)
+        # Swap-remove arrays of empty cells for O(1) uniform spawning
+        self.free = np.zeros((n, self.num_cells), dtype=np.int32)
+        self.free_slot = np.zeros((n, self.num_cells), dtype=np.int32)
+        self.free_count = np.zeros(n, dtype=np.int32)
+        self.food = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.alive = np.ones(n, dtype=bool)
+        self.ticks = np.zeros(n, dtype=np.int64)
+
+        self.reset()
+
+    def take_free(self, ids, cells):
+        slots = self.free_slot[ids, cells]
+        last = self.free[ids, self.free_count[ids] - 1]
+        self.free[ids, slots] = last
+        self.free_slot[ids, last] = slots
+        self.free_slot[ids, cells] = -1
+        self.free_count[ids] -= 1
+
+    def release_free(self, ids, cells):
+        self.free[ids, self.free_count[ids]] = cells
+        self.free_slot[ids, cells] = self.free_count[ids]
+        self.free_count[ids] += 1
+
+    def sample_free(self, ids):
+        # One empty cell per game (claimed), or -1 where the board is full
+        cells = np.full(len(ids), -1, dtype=np.int32)
+        has_room = self.free_count[ids] > 0
+        ids = ids[has_room]
+        picks = (self.rng.random(len(ids)) * self.free_count[ids]).astype(np.int32)
+        cells[has_room] = self.free[ids, picks]
+        self.take_free(ids, cells[has_room])
+        return cells
+
+    def reset(self, mask=None):
+        ids = self.env_ids if mask is None else self.env_ids[mask]
+        if len(ids) == 0:
+            return
+
+        self.head_x[ids] = self.cols // 2
+        self.head_y[ids] = self.rows // 2
+        self.direction[ids] = NO_ACTION
+        self.body_tail[ids] = 0
+        self.body_count[ids] = 1
+        self.length[ids] = 1
+        self.occupancy[ids] = False
+        self.free[ids] = np.arange(self.num_cells, dtype=np.int32)
+        self.free_slot[ids] = np.arange(self.num_cells, dtype=np.int32)
+        self.free_count[ids] = self.num_cells
+        start = np.full(len(ids), (self.rows // 2) * self.cols + self.cols // 2, dtype=np.int32)
+        self.body[ids, 0] = start
+        self.occupancy[ids, start] = True
+        self.take_free(ids, start)
+        self.score[ids] = 0
+        self.alive[ids] = True
+        self.ticks[ids] = 0
+
+        self.obstacles[ids] = False
+        if self.game_mode == GameMode.OBSTACLES:
+            for _ in range(self.obstacle_count):
+                cells = self.sample_free(ids)
+                placed = cells >= 0
+                self.obstacles[ids[placed], cells[placed]] = True
+        self.food[ids] = self.sample_free(ids)
+
+    def step(self, actions):
+        """Advance every live game one tick.
+
+        ``actions`` holds a Direction value per game, or NO_ACTION to keep
+        going straight. Returns per-game ``(rewards, dones)`` arrays; a done
+        game stays frozen until it is passed to ``reset``.
+        """
+        actions = np.asarray(actions, dtype=np.int8)
+        rewards = np.zeros(self.num_envs, dtype=np.int32)
+        was_alive = self.alive.copy()
+
+        # Turn, refusing direct reversals
+        turning = (actions != NO_ACTION) & self.alive & (
+            (self.direction == NO_ACTION) | (actions != (self.direction + 2) % 4))
+        self.direction[turning] = actions[turning]
+
+        ids = self.env_ids[self.alive & (self.direction != NO_ACTION)]
+        self.ticks[self.alive] += 1
+        if len(ids) == 0:
+            return rewards, np.zeros(self.num_envs, dtype=bool)
+
+        # Move with wrap-around
+        d = self.direction[ids]
+        self.head_x[ids] = (self.head_x[ids] + DX[d]) % self.cols
+        self.head_y[ids] = (self.head_y[ids] + DY[d]) % self.rows
+        head = self.head_y[ids] * self.cols + self.head_x[ids]
+
+        if self.game_mode == GameMode.OBSTACLES:
+            hit = self.obstacles[ids, head]
+            self.alive[ids[hit]] = False
+            ids, head = ids[~hit], head[~hit]
+
+        # Drop the tail before the collision test so chasing it is legal
+        full = self.body_count[ids] >= self.length[ids]
+        tail_ids = ids[full]
+        tail_cells = self.body[tail_ids, self.body_tail[tail_ids]]
+        self.occupancy[tail_ids, tail_cells] = False
+        self.release_free(tail_ids, tail_cells)
+        self.body_tail[tail_ids] = (self.body_tail[tail_ids] + 1) % self.num_cells
+        self.body_count[tail_ids] -= 1
+
+        hit = self.occupancy[ids, head]
+        self.alive[ids[hit]] = False
+        ids, head = ids[~hit], head[~hit]
+
+        slot = (self.body_tail[ids] + self.body_count[ids]) % self.num_cells
+        self.body[ids, slot] = head
+        self.occupancy[ids, head] = True
+        self.body_count[ids] += 1
+
+        # A food cell is already off the free list
+        ate = head == self.food[ids]
+        self.take_free(ids[~ate], head[~ate])
+        eaters = ids[ate]
+        self.length[eaters] += 1
+        self.score[eaters] += 10
+        rewards[eaters] = 10
+        self.food[eaters] = self.sample_free(eaters)
+
+        return rewards, was_alive & ~self.alive
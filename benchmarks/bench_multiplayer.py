@@ -0,0 +1,143 @@
+"""Load test for the multiplayer server with many bot clients.
+
+Starts ``multiplayer.py serve`` in a child process, connects ``rooms x
+players`` bots over localhost, and has each bot steer greedily towards the
+nearest food on its mirrored board. It then reports:
+
+- the tick rate each client actually received
+- delta inter-arrival jitter
+- bandwidth per client
+- the server's own per-tick cost
+
+    python benchmarks/bench_multiplayer.py --rooms 200 --players 4 --seconds 10
+"""
+import argparse
+import ast
+import asyncio
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from engine import DIRECTION_DELTAS, OPPOSITE_DIRECTIONS
+from multiplayer import FOOD, MSG_DELTA, GameClient
+
+
+def greedy_move(client, rng):
+    snake = client.snakes.get(client.player_id)
+    if not snake or not snake.alive:
+        return None
+    cols, rows = client.cols, client.rows
+    x, y = snake.body[-1] % cols, snake.body[-1] // cols
+    foods = [(i % cols, i // cols) for i, kind in client.items.items() if kind == FOOD]
+    last = None
+    if len(snake.body) > 1:
+        px, py = snake.body[-2] % cols, snake.body[-2] // cols
+        last = next(d for d, (dx, dy) in DIRECTION_DELTAS.items()
+                    if ((px + dx) % cols, (py + dy) % rows) == (x, y))
+
+    best, best_distance = None, None
+    for direction, (dx, dy) in DIRECTION_DELTAS.items():
+        if last is not None and direction == OPPOSITE_DIRECTIONS[last]:
+            continue
+        nx, ny = (x + dx) % cols, (y + dy) % rows
+        index = ny * cols + nx
+        if index in client.occupied or index in client.obstacles:
+            continue
+        distance = min((min(abs(nx - fx), cols - abs(nx - fx)) +
+                        min(abs(ny - fy), rows - abs(ny - fy)) for fx, fy in foods), default=0)
+        distance += rng.random()
+        if best is None or distance < best_distance:
+            best, best_distance = direction, distance
+    return best
+
+
+async def run_bot(port, room, name, deadline, results):
+    client = GameClient()
+    rng = random.Random(name)
+    await client.connect('127.0.0.1', port, room, name)
+    arrivals = []
+    last = None
+    try:
+        while time.perf_counter() < deadline:
+            if await client.receive() != MSG_DELTA:
+                continue
+            now = time.perf_counter()
+            if last is not None:
+                arrivals.append(now - last)
+            last = now
+            move = greedy_move(client, rng)
+            if move:
+                client.send_input(move)
+    finally:
+        await client.close()
+    results.append((len(arrivals), client.bytes_received, arrivals))
+
+
+def start_server(args):
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'multiplayer.py'), 'serve', '--port', '0',
+         '--tick-rate', str(args.tick_rate), '--max-players', str(args.players)],
+        stdout=subprocess.PIPE, text=True, env=env)
+    line = process.stdout.readline()
+    return process, int(line.rsplit(':', 1)[1])
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGINT)
+    output = process.communicate(timeout=30)[0].strip().splitlines()
+    return ast.literal_eval(output[-1]) if output else {}
+
+
+async def load(args, port):
+    deadline = time.perf_counter() + args.seconds
+    results = []
+    bots = [run_bot(port, f"room{r}", f"bot{r}-{p}", deadline, results)
+            for r in range(args.rooms) for p in range(args.players)]
+    await asyncio.gather(*bots)
+    return results
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Load-test the multiplayer server with bots.")
+    parser.add_argument('--rooms', type=int, default=100)
+    parser.add_argument('--players', type=int, default=4, help="bots per room")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--tick-rate', type=int, default=15)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    process, port = start_server(args)
+    try:
+        results = asyncio.run(load(args, port))
+    finally:
+        stats = stop_server(process)
+
+    deltas = sum(r[0] for r in results)
+    gaps = sorted(gap for r in results for gap in r[2]) or [0.0]
+    print(f"{len(results)} bots in {args.rooms} rooms for {args.seconds:.0f}s "
+          f"at {args.tick_rate} ticks/s")
+    print(f"{'delivered ticks/s per bot':<28}{deltas / len(results) / args.seconds:>10.1f}")
+    print(f"{'delta gap p50 / p99 ms':<28}{statistics.median(gaps) * 1000:>10.1f}"
+          f"{percentile(gaps, 0.99) * 1000:>8.1f}")
+    print(f"{'bytes/s per bot':<28}{sum(r[1] for r in results) / len(results) / args.seconds:>10.0f}")
+    if stats:
+        print(f"{'server tick p50 / p99 ms':<28}{stats['tick_p50_ms']:>10.2f}{stats['tick_p99_ms']:>8.2f}")
+        print(f"{'server overruns':<28}{stats['overruns']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Regression suite: tick throughput, render cost and persistence latency.
+
+Measures, under the SDL dummy drivers:
+
+- ``Game.handle_game`` ticks/s for every single-player mode and several
+  snake lengths (one simulation step plus rendering per call)
+- per-frame cost of ``draw_snake``, ``draw_text`` (cache hits and fresh
+  text) and each menu screen
+- ``save_score`` and leaderboard load (``Leaderboard`` construction) latency
+  against leaderboard size
+
+Each figure is the best of several timed batches of at least
+``--min-time`` seconds, which keeps scheduler noise out of the
+comparison. The suite runs ``--rounds`` times and keeps each metric's best
+figure; ``--save`` stores those as the baseline, along with each metric's
+noise: how much worse its slowest round was. ``benchmarks/baseline.json`` is committed,
+recorded on the reference setup shown in its ``machine`` entry. Runs on
+that setup are compared against it, and any metric that got worse by more
+than ``--threshold`` percent plus its noise is flagged. The exit status is
+1 when something regressed and 2 when there is no baseline for this setup
+to compare against.
+
+    python benchmarks/bench_regression.py             (after a change)
+    python benchmarks/bench_regression.py --save      (to re-record the baseline)
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+from engine import SOLO_MODES, Direction, GameMode
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+SNAKE_LENGTHS = [10, 100, 1000]
+LEADERBOARD_SIZES = [100, 10000, 100000]
+# Loading scores swings with the allocator and the page cache far more than
+# ticks or drawing do, so it runs longer and more batches. Saving keeps the
+# usual batches: every call adds a score, and long batches would grow the
+# leaderboard well past the size being measured
+LOAD_MIN_TIME = 1.0
+LOAD_REPEATS = 10
+MENUS = ['draw_menu', 'draw_game_mode_selection', 'draw_settings', 'draw_leaderboard',
+         'draw_achievements', 'draw_game_over']
+
+
+def timed(run, count):
+    # The collector is paused while timing, as timeit does
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        run(count)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def best_of(repeats, min_time, run):
+    # Seconds per operation from the fastest of several batches, each grown
+    # (like timeit's autorange) until it takes at least min_time
+    count = 1
+    while True:
+        elapsed = timed(run, count)
+        if elapsed >= min_time:
+            break
+        count *= 2 if elapsed * 10 > min_time else 10
+    best = elapsed / count
+    for _ in range(repeats - 1):
+        best = min(best, timed(run, count) / count)
+    return best
+
+
+def start_run(game, mode, length):
+    # A straight snake along the spawn row, on a board wide enough that
+    # it never catches its own tail during a measurement
+    from snakegame import GameState
+
+    game.settings.game_mode = mode
+    game.settings.grid_cols = length + 200
+    game.settings.grid_rows = 30
+    game.reset_game()
+    engine, sim = game.engine, game.sim
+    # Long enough that TIME_TRIAL never runs out mid-measurement
+    engine.time_limit = 10 ** 6
+    row = sim.head[1]
+    sim.obstacles = [cell for cell in sim.obstacles if cell[1] != row]
+    sim.foods = [cell for cell in sim.foods if cell[1] != row]
+    sim.length_of_snake = length
+    engine.set_body(sim, [(x, row) for x in range(length)])
+    sim.direction = Direction.RIGHT
+    game.show_run(engine, sim)
+    game.state = GameState.PLAYING
+    # One simulation step per handle_game call
+    game.wait_for_frame = lambda: 1000.0 / game.settings.snake_speed
+
+
+def bench_ticks(game, repeats, min_time):
+    from snakegame import GameState
+
+    results = {}
+    for mode in SOLO_MODES:
+        for length in SNAKE_LENGTHS:
+            start_run(game, mode, length)
+
+            def run(count):
+                for _ in range(count):
+                    game.handle_game()
+                if game.state != GameState.PLAYING:
+                    raise RuntimeError(f"{mode.name} run ended during the benchmark")
+            results[f"handle_game {mode.name.lower()} len={length}"] = (
+                1 / best_of(repeats, min_time, run), 'ticks/s')
+    del game.wait_for_frame
+    return results
+
+
+def bench_render(game, repeats, min_time):
+    results = {}
+    for length in SNAKE_LENGTHS:
+        start_run(game, GameMode.CLASSIC, length)
+        # Coil the snake through the visible area so every row has body cells
+        sim, engine = game.sim, game.engine
+        view_cols, view_rows = game.view_size
+        cells = [(x if y % 2 == 0 else view_cols - 1 - x, y)
+                 for y in range(view_rows) for x in range(view_cols)][:length]
+        sim.obstacles = []
+        sim.foods = []
+        engine.set_body(sim, cells)
+        game.show_run(engine, sim)
+
+        def run(count):
+            for _ in range(count):
+                game.draw_snake()
+        results[f"draw_snake len={length}"] = (best_of(repeats, min_time, run) * 1000, 'ms')
+
+    def cached(count):
+        for _ in range(count):
+            game.draw_text("Score: 1234", (255, 255, 255), 400, 300)
+    results["draw_text cached"] = (best_of(repeats, min_time, cached) * 1000, 'ms')
+
+    fresh_texts = iter(range(10 ** 9))
+
+    def fresh(count):
+        for _ in range(count):
+            game.draw_text(f"Score: {next(fresh_texts)}", (255, 255, 255), 400, 300)
+    results["draw_text uncached"] = (best_of(repeats, min_time, fresh) * 1000, 'ms')
+
+    for name in MENUS:
+        draw = getattr(game, name)
+
+        def run(count):
+            for _ in range(count):
+                draw()
+        results[f"{name}"] = (best_of(repeats, min_time, run) * 1000, 'ms')
+    return results
+
+
+def write_scores(path, count):
+    with open(path, 'w') as f:
+        for i in range(count):
+            f.write(f"{(i * 7919) % 100000}\t{SOLO_MODES[i % len(SOLO_MODES)].name}\t"
+                    f"{1700000000 + i}.000\t30.000\tPlayer{i % 50}\n")
+
+
+def bench_persistence(game, workdir, repeats, min_time):
+    from leaderboard import Leaderboard
+
+    results = {}
+    for size in LEADERBOARD_SIZES:
+        path = os.path.join(workdir, f"scores-{size}.log")
+        write_scores(path, size)
+
+        def load(count):
+            for _ in range(count):
+                Leaderboard(path)
+        results[f"load_scores n={size}"] = (
+            best_of(max(repeats, LOAD_REPEATS), max(min_time, LOAD_MIN_TIME), load) * 1000, 'ms')
+
+        game.leaderboard = Leaderboard(path, writer=game.writer)
+
+        def save(count):
+            for i in range(count):
+                game.save_score(i)
+            game.writer.flush()
+        results[f"save_score n={size}"] = (best_of(repeats, min_time, save) * 1000, 'ms')
+    return results
+
+
+def run_suite(args, workdir):
+    from snakegame import Game
+
+    game = Game(audio_enabled=False)
+    results = {}
+    try:
+        groups = [('ticks', lambda: bench_ticks(game, args.repeats, args.min_time)),
+                  ('render', lambda: bench_render(game, args.repeats, args.min_time)),
+                  ('persistence', lambda: bench_persistence(game, workdir, args.repeats, args.min_time))]
+        for group, run in groups:
+            if args.only and not re.search(args.only, group):
+                continue
+            results.update(run())
+    finally:
+        game.writer.close()
+    return results
+
+
+def machine():
+    return {'python': platform.python_version(), 'pygame': pygame.version.ver,
+            'platform': platform.platform(), 'processor': platform.processor()}
+
+
+def change(metric, baseline):
+    # Percentage by which a metric got worse (negative when it improved)
+    value, unit = metric
+    if unit == 'ticks/s':
+        return (baseline / value - 1) * 100
+    return (value / baseline - 1) * 100
+
+
+def combine(rounds):
+    # Best figure of each metric over several suite runs, and its noise:
+    # the percentage by which the slowest run was worse
+    results = {}
+    for name, (value, unit) in rounds[0].items():
+        values = [run[name][0] for run in rounds]
+        best = max(values) if unit == 'ticks/s' else min(values)
+        noise = max(change((value, unit), best) for value in values)
+        results[name] = (best, unit, round(noise, 1))
+    return results
+
+
+def report(results, baseline, threshold):
+    regressions = []
+    print(f"{'metric':<40}{'baseline':>12}{'current':>12}{'slower':>9}{'allowed':>9}  unit")
+    for name, (value, unit, _) in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:<40}{'-':>12}{value:>12.3f}{'':>18}  {unit}")
+            continue
+        worse = change((value, unit), old[0])
+        # Baselines recorded before noise was measured allow none
+        allowed = threshold + (old[2] if len(old) > 2 else 0)
+        flag = ''
+        if worse > allowed:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<40}{old[0]:>12.3f}{value:>12.3f}{worse:>+8.1f}%{allowed:>8.1f}%  {unit}{flag}")
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the game and compare against a baseline.")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=15.0,
+                        help="percent slowdown, beyond a metric's noise, reported as a regression")
+    parser.add_argument('--repeats', type=int, default=5, help="timed batches per metric")
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help="minimum seconds per timed batch")
+    parser.add_argument('--rounds', type=int, default=3,
+                        help="suite runs, keeping each metric's best and measuring its noise")
+    parser.add_argument('--only', help="regex selecting groups: ticks, render, persistence")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    args.baseline = os.path.abspath(args.baseline)
+    # Timings only compare against a baseline recorded on the same setup
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            stored = json.load(f)
+        if stored.get('machine') == machine():
+            baseline = stored['results']
+        elif not args.save:
+            print(f"Baseline at {args.baseline} was recorded on a different setup:\n"
+                  f"  {stored.get('machine')}\nthis one is\n  {machine()}\n"
+                  "Run with --save to record a baseline here")
+            sys.exit(2)
+    elif not args.save:
+        print(f"No baseline at {args.baseline}; run with --save to record one")
+        sys.exit(2)
+
+    cwd = os.getcwd()
+    # The game reads and writes settings, scores and levels in the working directory
+    with tempfile.TemporaryDirectory(prefix='snake-bench-') as workdir:
+        os.chdir(workdir)
+        try:
+            results = combine([run_suite(args, workdir) for _ in range(args.rounds)])
+        finally:
+            os.chdir(cwd)
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': machine(), 'results': results}, f, indent=1)
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:g}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Import-to-first-frame startup latency.
+
+Starts fresh interpreters under the SDL dummy drivers, imports snakegame,
+builds a Game and draws the main menu, and reports the median of each
+phase across runs.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD = """
+import time
+start = time.perf_counter()
+import json, sys
+sys.path.insert(0, {root!r})
+import snakegame
+imported = time.perf_counter()
+game = snakegame.Game()
+constructed = time.perf_counter()
+game.draw_menu()
+first_frame = time.perf_counter()
+game.audio.wait_loaded()
+game.leaderboard.wait_loaded()
+background_done = time.perf_counter()
+game.writer.close()
+print(json.dumps({{
+    'import': imported - start,
+    'game_init': constructed - imported,
+    'first_frame': first_frame - start,
+    'background_loads': background_done - start
+}}))
+"""
+
+
+def run_once(workdir):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy',
+               PYGAME_HIDE_SUPPORT_PROMPT='1')
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT)], cwd=workdir,
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_once(workdir) for _ in range(runs)]
+    print(f"{'phase':<18}{'median ms':>10}")
+    for phase in results[0]:
+        median = statistics.median(result[phase] for result in results)
+        print(f"{phase:<18}{median * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
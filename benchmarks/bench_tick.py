@@ -0,0 +1,44 @@
+"""Engine tick cost versus snake length.
+
+Lays a snake of each length along a single long row and times straight
+moves. With the deque body and occupancy grid the per-tick cost should
+stay flat as the snake grows.
+
+    python benchmarks/bench_tick.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from engine import Direction, Engine
+
+BOARD_COLS = 50000
+TICKS = 20000
+LENGTHS = [10, 100, 1000, 10000, 25000]
+
+
+def time_ticks(length):
+    engine = Engine(BOARD_COLS, 1)
+    state = engine.reset()
+    state.foods = [(BOARD_COLS - 1, 0)]
+    engine.set_body(state, [(x, 0) for x in range(length)])
+    state.direction = Direction.RIGHT
+
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        engine.step(state)
+    elapsed = time.perf_counter() - start
+    assert state.alive
+    return elapsed / TICKS
+
+
+def main():
+    print(f"{'length':>8}  {'us/tick':>8}")
+    for length in LENGTHS:
+        print(f"{length:>8}  {time_ticks(length) * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
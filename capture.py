@@ -0,0 +1,240 @@
+"""Offscreen frame capture for videos and pixel observations.
+
+Frames are drawn by the game's own renderer (``Game.render_to``, so the
+same ``draw_snake``, ``draw_obstacles`` and HUD code) straight into memory
+a sink owns. Each target is a ``pygame.image.frombuffer`` surface over that
+memory in RGBX order, so no frame is copied after it is drawn:
+
+* ``EncoderSink`` writes each buffer to an ffmpeg raw-video pipe
+  (MP4, GIF or anything else ffmpeg infers from the file name).
+* ``SharedFrameRing`` renders into the slots of a shared-memory ring.
+  Another process attaches by name and reads frames as NumPy views.
+
+Runs under the SDL dummy video driver, so no display is needed. Requires
+NumPy; video output also needs ffmpeg on PATH.
+
+    python capture.py replay replays/run.snkr highlight.mp4 --start 300 --end 900
+    python capture.py autopilot --ring snake-frames --ticks 10000
+    python snakegame.py capture ...      (same entry point)
+"""
+import argparse
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+BYTES_PER_PIXEL = 4
+# Shared ring header: frames published, width, height, slot count
+RING_HEADER = struct.Struct("<QIII")
+
+
+def frame_surface(buffer, size):
+    # A surface drawing directly into buffer (RGBX rows, top to bottom)
+    return pygame.image.frombuffer(buffer, size, 'RGBX')
+
+
+def rgb_view(buffer, size):
+    # Read-only (height, width, 3) view of an RGBX frame buffer
+    width, height = size
+    pixels = np.frombuffer(buffer, dtype=np.uint8, count=width * height * BYTES_PER_PIXEL)
+    return pixels.reshape(height, width, BYTES_PER_PIXEL)[:, :, :3]
+
+
+class EncoderSink:
+    def __init__(self, path, size, fps=30, command=None):
+        self.size = size
+        self.buffer = bytearray(size[0] * size[1] * BYTES_PER_PIXEL)
+        self.surface = frame_surface(self.buffer, size)
+        self.view = memoryview(self.buffer)
+        if command is None:
+            if shutil.which('ffmpeg') is None:
+                raise RuntimeError("ffmpeg was not found on PATH")
+            command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb0',
+                       '-s', f"{size[0]}x{size[1]}", '-r', str(fps), '-i', '-']
+            if path.endswith('.gif'):
+                command += ['-vf', 'split[a][b];[a]palettegen[p];[b][p]paletteuse']
+            else:
+                command += ['-pix_fmt', 'yuv420p']
+            command.append(path)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.frames = 0
+
+    def next_surface(self):
+        return self.surface
+
+    def commit(self):
+        self.process.stdin.write(self.view)
+        self.frames += 1
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"Encoder exited with status {self.process.returncode}")
+
+
+class SharedFrameRing:
+    """Ring of frames in shared memory.
+
+    The writer renders into slot ``n % slots`` and then publishes ``n + 1``
+    in the header. A reader takes the frame for a sequence number and
+    checks afterwards that the writer has not lapped it.
+    """
+
+    def __init__(self, name, size=None, slots=8, create=True):
+        if create:
+            frame_bytes = size[0] * size[1] * BYTES_PER_PIXEL
+            self.memory = shared_memory.SharedMemory(name, create=True,
+                                                     size=RING_HEADER.size + slots * frame_bytes)
+            RING_HEADER.pack_into(self.memory.buf, 0, 0, size[0], size[1], slots)
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+        _, width, height, self.slots = RING_HEADER.unpack_from(self.memory.buf, 0)
+        self.size = (width, height)
+        self.owner = create
+        self.frame_bytes = width * height * BYTES_PER_PIXEL
+        self.buffers = [self.memory.buf[RING_HEADER.size + i * self.frame_bytes:
+                                        RING_HEADER.size + (i + 1) * self.frame_bytes]
+                        for i in range(self.slots)]
+        self.surfaces = [frame_surface(buffer, self.size) for buffer in self.buffers] if create else []
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name, create=False)
+
+    def published(self):
+        return RING_HEADER.unpack_from(self.memory.buf, 0)[0]
+
+    def next_surface(self):
+        return self.surfaces[self.published() % self.slots]
+
+    def commit(self):
+        self.memory.buf[:8] = struct.pack("<Q", self.published() + 1)
+
+    def frame(self, sequence):
+        # RGB view of frame number sequence (1-based); None once overwritten
+        if not self.published() - self.slots < sequence <= self.published():
+            return None
+        return rgb_view(self.buffers[(sequence - 1) % self.slots], self.size)
+
+    def latest(self):
+        return self.frame(self.published())
+
+    def close(self):
+        self.buffers = []
+        self.surfaces = []
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class FrameCapture:
+    def __init__(self, game, sink):
+        self.game = game
+        self.sink = sink
+        self.frames = 0
+
+    def capture(self, alpha=1.0):
+        self.game.render_to(self.sink.next_surface(), alpha)
+        self.sink.commit()
+        self.frames += 1
+
+
+def open_sink(args, size, fps):
+    if args.ring:
+        return SharedFrameRing(args.ring, size, slots=args.slots)
+    return EncoderSink(args.output, size, fps)
+
+
+def capture_replay(game, args):
+    from replay import ReplayPlayer
+
+    player = ReplayPlayer.load(args.replay)
+    end = player.total_ticks if args.end is None else min(args.end, player.total_ticks)
+    sink = open_sink(args, game.window.get_size(), args.fps or player.engine.tick_rate)
+    capture = FrameCapture(game, sink)
+    try:
+        for state in player.play(args.start):
+            # seek clamps args.start, so the first state may not be at that tick
+            if capture.frames == 0:
+                game.show_run(player.engine, state)
+            capture.capture()
+            if state.tick >= end:
+                break
+    finally:
+        sink.close()
+    return capture.frames
+
+
+def capture_autopilot(game, args):
+    from autopilot import Autopilot
+
+    # A bare engine: the game's score, achievement and audio observers stay
+    # detached, so bot runs are never saved as the player's
+    engine = game.create_engine(game.current_level())
+    sink = open_sink(args, game.window.get_size(), args.fps or game.settings.snake_speed)
+    capture = FrameCapture(game, sink)
+    sim = autopilot = None
+    try:
+        while capture.frames < args.ticks:
+            if sim is None or not sim.alive:
+                sim = engine.reset()
+                game.show_run(engine, sim)
+                autopilot = Autopilot(engine)
+            engine.step(sim, autopilot.choose(sim))
+            capture.capture()
+    finally:
+        sink.close()
+    return capture.frames
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Render game frames offscreen.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replay = subparsers.add_parser('replay', help="render a saved replay")
+    replay.add_argument('replay')
+    replay.add_argument('output', nargs='?')
+    replay.add_argument('--start', type=int, default=0)
+    replay.add_argument('--end', type=int)
+    autopilot = subparsers.add_parser('autopilot', help="render autopilot games")
+    autopilot.add_argument('output', nargs='?')
+    autopilot.add_argument('--ticks', type=int, default=1000)
+    for sub in (replay, autopilot):
+        sub.add_argument('--fps', type=int, help="video frame rate (default: tick rate)")
+        sub.add_argument('--ring', help="publish to this shared-memory ring instead of a video")
+        sub.add_argument('--slots', type=int, default=8)
+    args = parser.parse_args(argv)
+    if not args.output and not args.ring:
+        parser.error("give an output file or --ring")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    from snakegame import Game
+
+    game = Game(audio_enabled=False)
+    start = time.perf_counter()
+    try:
+        if args.command == 'replay':
+            frames = capture_replay(game, args)
+        else:
+            frames = capture_autopilot(game, args)
+    except RuntimeError as e:
+        sys.exit(f"Capture failed: {str(e)}")
+    finally:
+        game.writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames in {elapsed:.1f}s ({frames / elapsed:,.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,593 @@
+"""Pygame-free simulation core for the snake game.
+
+The engine works in integer grid cells and simulation ticks and knows
+nothing about windows, fonts, sounds or the wall clock; all randomness
+comes from a seeded ``random.Random``, so a seed plus the per-tick
+actions reproduce a run exactly. ``Engine.step(state, action)`` advances one tick and
+records what happened in ``state.events``; renderers and audio are
+optional observers registered with ``Engine.add_observer``.
+"""
+import random
+from array import array
+from bisect import bisect_right
+from collections import deque
+from enum import Enum
+from itertools import accumulate
+
+
+class GameMode(Enum):
+    CLASSIC = 1
+    TIME_TRIAL = 2
+    OBSTACLES = 3
+    # Replays store these values, so they never change; 4 is unused
+    ARENA = 5
+
+class PowerUpType(Enum):
+    SPEED = 1
+    DOUBLE_SCORE = 2
+    SHIELD = 3
+
+class Direction(Enum):
+    UP = 0
+    RIGHT = 1
+    DOWN = 2
+    LEFT = 3
+
+class GameEvent(Enum):
+    FOOD_EATEN = 1
+    POWER_UP_SPAWNED = 2
+    POWER_UP_COLLECTED = 3
+    POWER_UP_EXPIRED = 4
+    DIED = 5
+    TIME_UP = 6
+    SCORE_CHANGED = 7
+    LENGTH_CHANGED = 8
+
+# Modes a single local Engine plays; multiplayer rooms (multiplayer.py) are
+# not a GameMode, and run CLASSIC rules on a shared board
+SOLO_MODES = [GameMode.CLASSIC, GameMode.TIME_TRIAL, GameMode.OBSTACLES, GameMode.ARENA]
+# Modes where obstacles are placed and deadly
+OBSTACLE_MODES = [GameMode.OBSTACLES, GameMode.ARENA]
+# Items on the board at once in ARENA mode (other modes have one of each)
+ARENA_FOOD_COUNT = 24
+ARENA_POWER_UPS = 6
+# Cells per chunk, and chunks per group, in the free-cell rank index
+RANK_CHUNK = 128
+
+DIRECTION_DELTAS = {
+    Direction.UP: (0, -1),
+    Direction.RIGHT: (1, 0),
+    Direction.DOWN: (0, 1),
+    Direction.LEFT: (-1, 0)
+}
+
+OPPOSITE_DIRECTIONS = {
+    Direction.UP: Direction.DOWN,
+    Direction.RIGHT: Direction.LEFT,
+    Direction.DOWN: Direction.UP,
+    Direction.LEFT: Direction.RIGHT
+}
+
+
+class ItemKind(Enum):
+    # Static contents of SimState.items; power-ups are stored as PowerUp objects
+    FOOD = 1
+    OBSTACLE = 2
+
+
+def spawn_cell(cols, rows):
+    # Where every run starts; levels keep the area around it clear
+    return (cols // 2, rows // 2)
+
+
+class PowerUp:
+    def __init__(self, type, position, duration):
+        self.type = type
+        self.position = position
+        self.duration = duration  # in ticks
+        self.start_tick = None
+        self.active = False
+
+    def activate(self, tick):
+        self.active = True
+        self.start_tick = tick
+
+    def is_expired(self, tick):
+        if not self.active:
+            return False
+        return tick - self.start_tick > self.duration
+
+
+class FreeCells:
+    # Swap-remove array of free cell indices: O(1) add, remove and uniform sample.
+    # Samples depend on the array's order, so only version 1-2 replays use it
+    # 0..size-1 for the last board size, copied (a memcpy) on every reset
+    identity = array('i')
+
+    def __init__(self, size, cells=None):
+        if cells is None:
+            # Every cell free, in order: each slot is its own index
+            if len(FreeCells.identity) != size:
+                FreeCells.identity = array('i', range(size))
+            self.cells = FreeCells.identity[:]
+            self.slots = FreeCells.identity[:]
+            return
+        self.cells = array('i', cells)
+        self.slots = array('i', [-1]) * size
+        for slot, index in enumerate(self.cells):
+            self.slots[index] = slot
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, index):
+        return self.slots[index] >= 0
+
+    def add(self, index):
+        if self.slots[index] >= 0:
+            return
+        self.slots[index] = len(self.cells)
+        self.cells.append(index)
+
+    def remove(self, index):
+        slot = self.slots[index]
+        if slot < 0:
+            return
+        last = self.cells.pop()
+        if last != index:
+            self.cells[slot] = last
+            self.slots[last] = slot
+        self.slots[index] = -1
+
+    def sample(self, rng):
+        if not self.cells:
+            return None
+        return self.cells[rng.randrange(len(self.cells))]
+
+
+class FreeRanks:
+    # Free flag per cell, with free counts per chunk of RANK_CHUNK cells and
+    # per group of RANK_CHUNK chunks: O(1) add and remove, and the free cell
+    # of a given rank in index order is found from prefix sums of a few
+    # hundred counts at most. A pick by rank depends only on which cells are free, never on
+    # the order they were freed in
+    def __init__(self, size):
+        self.size = size
+        self.free = bytearray(b'\x01') * size
+        self.count = size
+        self.chunk_free = self.counts(size, RANK_CHUNK)
+        self.group_free = self.counts(size, RANK_CHUNK * RANK_CHUNK)
+
+    @staticmethod
+    def counts(size, span):
+        # Free cells per span on an empty board; the last span may be short
+        spans = -(-size // span)
+        counts = array('i', [span]) * spans
+        if spans:
+            counts[-1] = size - (spans - 1) * span
+        return counts
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, index):
+        return self.free[index] == 1
+
+    def add(self, index):
+        if self.free[index]:
+            return
+        self.free[index] = 1
+        self.count += 1
+        self.chunk_free[index // RANK_CHUNK] += 1
+        self.group_free[index // (RANK_CHUNK * RANK_CHUNK)] += 1
+
+    def remove(self, index):
+        if not self.free[index]:
+            return
+        self.free[index] = 0
+        self.count -= 1
+        self.chunk_free[index // RANK_CHUNK] -= 1
+        self.group_free[index // (RANK_CHUNK * RANK_CHUNK)] -= 1
+
+    def select(self, rank):
+        # Index of the free cell with rank free cells before it
+        totals = list(accumulate(self.group_free))
+        group = bisect_right(totals, rank)
+        if group:
+            rank -= totals[group - 1]
+        chunk_free = self.chunk_free
+        first = group * RANK_CHUNK
+        totals = list(accumulate(chunk_free[first:first + RANK_CHUNK]))
+        offset = bisect_right(totals, rank)
+        if offset:
+            rank -= totals[offset - 1]
+        chunk = first + offset
+        # Step over whichever is rarer in the chunk: free cells, or the
+        # blocked ones that push the answer past start + rank
+        free = self.free
+        if chunk_free[chunk] < RANK_CHUNK // 2:
+            index = free.index(1, chunk * RANK_CHUNK)
+            for _ in range(rank):
+                index = free.index(1, index + 1)
+            return index
+        index = chunk * RANK_CHUNK + rank
+        blocked = free.find(0, chunk * RANK_CHUNK, index + 1)
+        while blocked != -1:
+            index += 1
+            blocked = free.find(0, blocked + 1, index + 1)
+        return index
+
+
+class SimState:
+    def __init__(self):
+        self.head = (0, 0)
+        self.direction = None
+        self.snake_list = deque()
+        # Per-cell count of snake segments (a shield lets segments overlap)
+        self.occupancy = []
+        # Per-cell count of anything occupying it, and the cells where that is zero
+        self.blocked = []
+        self.free_cells = None
+        # Cells whose contents changed during the last step, for renderers
+        self.changed_cells = []
+        self.length_of_snake = 1
+        self.foods = []
+        self.obstacles = []
+        # Power-ups lying on the board, waiting to be collected
+        self.power_ups = []
+        # Cell index -> ItemKind or PowerUp, so a cell's contents are one lookup
+        self.items = {}
+        self.active_power_ups = []
+        self.power_up_spawn_tick = 0
+        self.score = 0
+        self.alive = True
+        self.time_remaining = 0
+        self.tick = 0
+        self.events = []
+
+    @property
+    def food(self):
+        # The oldest food; the only one outside ARENA mode
+        return self.foods[0] if self.foods else None
+
+    @property
+    def current_power_up(self):
+        return self.power_ups[0] if self.power_ups else None
+
+    def has_shield(self):
+        return any(p.type == PowerUpType.SHIELD and p.active for p in self.active_power_ups)
+
+
+class Engine:
+    def __init__(self, cols, rows, game_mode=GameMode.CLASSIC, tick_rate=15,
+                 time_limit=60, power_up_spawn_interval=10, power_up_duration=5,
+                 obstacle_count=5, level=None, food_count=None, max_power_ups=None, seed=None,
+                 legacy_sampling=False):
+        # Durations are given in seconds and converted using tick_rate (ticks/sec)
+        self.cols = cols
+        self.rows = rows
+        self.game_mode = game_mode
+        self.tick_rate = tick_rate
+        self.time_limit = time_limit
+        self.power_up_spawn_interval = power_up_spawn_interval
+        self.power_up_duration = power_up_duration
+        self.obstacle_count = obstacle_count
+        # Fixed obstacle cells (see levels.py) used instead of random ones
+        self.level = level
+        arena = game_mode == GameMode.ARENA
+        self.food_count = food_count or (ARENA_FOOD_COUNT if arena else 1)
+        self.max_power_ups = max_power_ups or (ARENA_POWER_UPS if arena else 1)
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        # Version 1-2 replays sampled free cells from the free list's own order
+        self.legacy_sampling = legacy_sampling
+        self.observers = []
+
+    def add_observer(self, callback):
+        # callback(event, state) is called for every event a step produces
+        self.observers.append(callback)
+
+    def remove_observer(self, callback):
+        self.observers.remove(callback)
+
+    def ticks(self, seconds):
+        return round(seconds * self.tick_rate)
+
+    def elapsed(self, state):
+        return state.tick / self.tick_rate
+
+    def cell_index(self, cell):
+        return cell[1] * self.cols + cell[0]
+
+    def cell_at(self, index):
+        return (index % self.cols, index // self.cols)
+
+    def block(self, state, cell):
+        index = self.cell_index(cell)
+        if state.blocked[index] == 0:
+            state.free_cells.remove(index)
+        state.blocked[index] += 1
+        state.changed_cells.append(cell)
+
+    def unblock(self, state, cell):
+        index = self.cell_index(cell)
+        state.blocked[index] -= 1
+        if state.blocked[index] == 0:
+            state.free_cells.add(index)
+        state.changed_cells.append(cell)
+
+    def free_cell(self, state):
+        # Uniform over empty cells, or None when the board is full. The free
+        # cell of a random rank in index order depends only on the board
+        # contents and the RNG, so snapshots need not store a free list
+        if self.legacy_sampling:
+            index = state.free_cells.sample(self.rng)
+            return None if index is None else self.cell_at(index)
+        free = len(state.free_cells)
+        if not free:
+            return None
+        return self.cell_at(state.free_cells.select(self.rng.randrange(free)))
+
+    def rebuild_cells(self, state):
+        size = self.cols * self.rows
+        # Compact int arrays keep million-cell boards cheap
+        state.occupancy = array('i', [0]) * size
+        state.blocked = array('i', [0]) * size
+        state.free_cells = FreeCells(size) if self.legacy_sampling else FreeRanks(size)
+        for cell in state.snake_list:
+            state.occupancy[self.cell_index(cell)] += 1
+            self.block(state, cell)
+        state.items = {}
+        for cell in state.obstacles:
+            self.add_item(state, cell, ItemKind.OBSTACLE)
+        for cell in state.foods:
+            self.add_item(state, cell, ItemKind.FOOD)
+        for power_up in state.power_ups:
+            self.add_item(state, power_up.position, power_up)
+
+    def add_item(self, state, cell, item):
+        state.items[self.cell_index(cell)] = item
+        self.block(state, cell)
+
+    def remove_item(self, state, cell):
+        del state.items[self.cell_index(cell)]
+        self.unblock(state, cell)
+
+    def item_at(self, state, cell):
+        return state.items.get(self.cell_index(cell))
+
+    def set_body(self, state, cells):
+        # Replace the snake with cells (tail first, head last)
+        state.snake_list = deque(cells)
+        state.length_of_snake = max(state.length_of_snake, len(state.snake_list))
+        if state.snake_list:
+            state.head = state.snake_list[-1]
+        self.rebuild_cells(state)
+
+    def reset(self, state=None):
+        state = state or SimState()
+        state.head = spawn_cell(self.cols, self.rows)
+        state.direction = None
+        state.snake_list = deque([state.head])
+        state.length_of_snake = 1
+        state.foods = []
+        state.obstacles = []
+        state.power_ups = []
+        self.rebuild_cells(state)
+        state.active_power_ups = []
+        state.power_up_spawn_tick = 0
+        state.score = 0
+        state.alive = True
+        state.time_remaining = self.time_limit
+        state.tick = 0
+        state.events = []
+
+        if self.game_mode in OBSTACLE_MODES:
+            self.generate_obstacles(state)
+        for _ in range(self.food_count):
+            self.spawn_food(state)
+        state.changed_cells = []
+        return state
+
+    def snapshot(self, state):
+        # Everything needed to resume the run exactly, as plain values
+        return {
+            'tick': state.tick,
+            'score': state.score,
+            'alive': state.alive,
+            'length_of_snake': state.length_of_snake,
+            'direction': state.direction,
+            'head': state.head,
+            'snake': list(state.snake_list),
+            'foods': list(state.foods),
+            'obstacles': list(state.obstacles),
+            'power_ups': [(p.type, p.position) for p in state.power_ups],
+            'active_power_ups': [(p.type, p.position, p.start_tick, p.duration)
+                                 for p in state.active_power_ups],
+            'power_up_spawn_tick': state.power_up_spawn_tick,
+            'free_cells': list(state.free_cells.cells) if self.legacy_sampling else None,
+            'rng': self.rng.getstate()
+        }
+
+    def restore(self, snapshot):
+        state = SimState()
+        state.tick = snapshot['tick']
+        state.score = snapshot['score']
+        state.alive = snapshot['alive']
+        state.length_of_snake = snapshot['length_of_snake']
+        state.direction = snapshot['direction']
+        state.foods = list(snapshot['foods'])
+        state.obstacles = list(snapshot['obstacles'])
+        state.power_ups = [PowerUp(power_up_type, position, self.ticks(self.power_up_duration))
+                           for power_up_type, position in snapshot['power_ups']]
+        for power_up_type, position, start_tick, duration in snapshot['active_power_ups']:
+            power_up = PowerUp(power_up_type, position, duration)
+            power_up.activate(start_tick)
+            state.active_power_ups.append(power_up)
+        state.power_up_spawn_tick = snapshot['power_up_spawn_tick']
+        if self.game_mode == GameMode.TIME_TRIAL:
+            state.time_remaining = max(0, self.time_limit - self.elapsed(state))
+        else:
+            state.time_remaining = self.time_limit
+        self.set_body(state, snapshot['snake'])
+        state.head = snapshot['head']
+        state.length_of_snake = snapshot['length_of_snake']
+        if self.legacy_sampling:
+            # Legacy sampling depends on the free list order, so restore it verbatim
+            state.free_cells = FreeCells(self.cols * self.rows, snapshot['free_cells'])
+        state.changed_cells = []
+        self.rng.setstate(snapshot['rng'])
+        return state
+
+    def generate_obstacles(self, state):
+        for cell in state.obstacles:
+            self.remove_item(state, cell)
+        state.obstacles = []
+        if self.level is not None:
+            for cell in self.level:
+                if state.blocked[self.cell_index(cell)] == 0:
+                    state.obstacles.append(cell)
+                    self.add_item(state, cell, ItemKind.OBSTACLE)
+        else:
+            for _ in range(self.obstacle_count):
+                cell = self.free_cell(state)
+                if cell is None:
+                    break
+                state.obstacles.append(cell)
+                self.add_item(state, cell, ItemKind.OBSTACLE)
+
+    def spawn_food(self, state):
+        cell = self.free_cell(state)
+        if cell is not None:
+            state.foods.append(cell)
+            self.add_item(state, cell, ItemKind.FOOD)
+
+    def check_obstacle_collision(self, state):
+        return self.item_at(state, state.head) is ItemKind.OBSTACLE
+
+    def check_self_collision(self, state):
+        # The head counts itself once; anything more is the body
+        return state.occupancy[self.cell_index(state.head)] > 1
+
+    def advance_body(self, state):
+        occupancy = state.occupancy
+        state.snake_list.append(state.head)
+        occupancy[self.cell_index(state.head)] += 1
+        self.block(state, state.head)
+        if len(state.snake_list) > state.length_of_snake:
+            tail = state.snake_list.popleft()
+            occupancy[self.cell_index(tail)] -= 1
+            self.unblock(state, tail)
+
+    def turn(self, state, action):
+        if action is None:
+            return
+        if state.direction is not None and action == OPPOSITE_DIRECTIONS[state.direction]:
+            return
+        state.direction = action
+
+    def direction_between(self, cell, neighbour):
+        # Direction from a cell to an adjacent one, across the wrap-around edges
+        dx = (neighbour[0] - cell[0]) % self.cols
+        dy = (neighbour[1] - cell[1]) % self.rows
+        if dx == 1:
+            return Direction.RIGHT
+        elif dx:
+            return Direction.LEFT
+        elif dy == 1:
+            return Direction.DOWN
+        return Direction.UP
+
+    def move(self, state):
+        if state.direction is None:
+            return
+        dx, dy = DIRECTION_DELTAS[state.direction]
+        x, y = state.head
+        state.head = ((x + dx) % self.cols, (y + dy) % self.rows)
+
+    def handle_time_trial(self, state):
+        state.time_remaining = max(0, self.time_limit - self.elapsed(state))
+        if state.time_remaining <= 0:
+            state.events.append(GameEvent.TIME_UP)
+            state.alive = False
+            return True
+        return False
+
+    def handle_power_ups(self, state):
+        # Expire finished power-ups
+        for power_up in state.active_power_ups[:]:
+            if power_up.is_expired(state.tick):
+                state.active_power_ups.remove(power_up)
+                state.events.append(GameEvent.POWER_UP_EXPIRED)
+
+        # Spawn new power-up while the pool has room
+        if (len(state.power_ups) < self.max_power_ups and
+            state.tick - state.power_up_spawn_tick > self.ticks(self.power_up_spawn_interval)):
+
+            # Random chance to spawn power-up
+            if self.rng.random() < 0.3:  # 30% chance
+                power_up_type = self.rng.choice(list(PowerUpType))
+                cell = self.free_cell(state)
+                if cell is not None:
+                    power_up = PowerUp(power_up_type, cell, self.ticks(self.power_up_duration))
+                    state.power_ups.append(power_up)
+                    self.add_item(state, cell, power_up)
+                    state.power_up_spawn_tick = state.tick
+                    state.events.append(GameEvent.POWER_UP_SPAWNED)
+
+        power_up = self.item_at(state, state.head)
+        if isinstance(power_up, PowerUp):
+            self.remove_item(state, power_up.position)
+            state.power_ups.remove(power_up)
+            power_up.activate(state.tick)
+            state.active_power_ups.append(power_up)
+            state.power_up_spawn_tick = state.tick
+            state.events.append(GameEvent.POWER_UP_COLLECTED)
+
+    def die(self, state):
+        if state.has_shield():
+            return False
+        state.alive = False
+        state.events.append(GameEvent.DIED)
+        return True
+
+    def step(self, state, action=None):
+        state.events = []
+        state.changed_cells = []
+        if not state.alive:
+            return state
+        state.tick += 1
+
+        self.turn(state, action)
+        self.move(state)
+
+        if self.game_mode == GameMode.TIME_TRIAL:
+            if self.handle_time_trial(state):
+                return self.notify(state)
+        elif self.game_mode in OBSTACLE_MODES:
+            if self.check_obstacle_collision(state) and self.die(state):
+                return self.notify(state)
+
+        self.handle_power_ups(state)
+        self.advance_body(state)
+
+        if self.check_self_collision(state) and self.die(state):
+            return self.notify(state)
+
+        if self.item_at(state, state.head) is ItemKind.FOOD:
+            self.remove_item(state, state.head)
+            state.foods.remove(state.head)
+            self.spawn_food(state)
+            state.length_of_snake += 1
+            state.score += 10
+            state.events.append(GameEvent.FOOD_EATEN)
+            state.events.append(GameEvent.LENGTH_CHANGED)
+            state.events.append(GameEvent.SCORE_CHANGED)
+
+        return self.notify(state)
+
+    def notify(self, state):
+        for event in state.events:
+            for callback in self.observers:
+                callback(event, state)
+        return state
@@ -0,0 +1,166 @@
+"""Persistent leaderboard of every finished run.
+
+Runs are appended one tab-separated line at a time to ``scores.log`` and
+never rewritten; with a ``BackgroundWriter`` the appends happen off the
+calling thread. On load they are indexed per game mode (and across all
+modes) in sorted lists of integer keys, so top-K, rank and percentile
+queries are binary searches. Every line is parsed in full while indexing,
+so malformed lines (such as a torn write) are skipped rather than indexed.
+Loading can run on a background thread; queries wait for it to finish.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+from engine import GameMode
+from persistence import append_lines
+
+LEGACY_SCORES_FILE = 'scores.json'
+
+# Index keys pack (-score, sequence) into one int so a million of them sort fast
+SEQUENCE_BITS = 32
+
+
+def index_key(score, sequence):
+    return (-score << SEQUENCE_BITS) + sequence
+
+
+class ScoreRecord:
+    __slots__ = ('player', 'mode', 'score', 'timestamp', 'duration')
+
+    def __init__(self, player, mode, score, timestamp, duration):
+        self.player = player
+        self.mode = mode
+        self.score = score
+        self.timestamp = timestamp
+        self.duration = duration
+
+    def to_line(self):
+        player = " ".join(self.player.split())
+        return f"{self.score}\t{self.mode.name}\t{self.timestamp:.3f}\t{self.duration:.3f}\t{player}\n"
+
+    @classmethod
+    def from_line(cls, line):
+        score, mode, timestamp, duration, player = line.split('\t', 4)
+        return cls(player, GameMode[mode], int(score), float(timestamp), float(duration))
+
+
+class Leaderboard:
+    def __init__(self, path='scores.log', writer=None, background=False):
+        self.path = path
+        self.writer = writer
+        self.lines = []
+        # mode (None for all modes) -> sorted index keys
+        self.index = {None: []}
+        for mode in GameMode:
+            self.index[mode] = []
+        self.needs_newline = False
+        self.loader = None
+        if background:
+            self.loader = threading.Thread(target=self.load, name="LeaderboardLoader", daemon=True)
+            self.loader.start()
+        else:
+            self.load()
+
+    def wait_loaded(self):
+        if self.loader:
+            self.loader.join()
+            self.loader = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self.import_legacy_scores()
+            return
+        with open(self.path, 'r') as f:
+            data = f.read()
+
+        # A crash mid-append can leave a torn final line; ignore it
+        lines = data.split('\n')
+        self.needs_newline = lines[-1] != ''
+        # The final piece has no newline: it is empty or a torn write, and is skipped
+        all_modes = self.index[None]
+        for line in lines[:-1]:
+            try:
+                record = ScoreRecord.from_line(line)
+            except (ValueError, KeyError):
+                continue
+            key = index_key(record.score, len(self.lines))
+            self.lines.append(line)
+            all_modes.append(key)
+            self.index[record.mode].append(key)
+        for keys in self.index.values():
+            keys.sort()
+
+    def import_legacy_scores(self):
+        # scores.json held a bare top-10 list with no mode; keep them as Classic runs
+        if not os.path.exists(LEGACY_SCORES_FILE):
+            return
+        try:
+            with open(LEGACY_SCORES_FILE, 'r') as f:
+                scores = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(scores, list):
+            for score in scores:
+                if isinstance(score, int):
+                    self.insert("Player", GameMode.CLASSIC, score, 0, 0)
+
+    def add(self, player, mode, score, duration=0, timestamp=None):
+        self.wait_loaded()
+        return self.insert(player, mode, score, duration,
+                           time.time() if timestamp is None else timestamp)
+
+    def insert(self, player, mode, score, duration, timestamp):
+        record = ScoreRecord(player, mode, score, timestamp, duration)
+        line = record.to_line()
+        self.append(line)
+        key = index_key(score, len(self.lines))
+        self.lines.append(line[:-1])
+        bisect.insort(self.index[None], key)
+        bisect.insort(self.index[mode], key)
+        return record
+
+    def append(self, line):
+        if self.needs_newline:
+            line = '\n' + line
+            self.needs_newline = False
+        if self.writer:
+            self.writer.append(self.path, line)
+        else:
+            append_lines(self.path, [line])
+
+    def __len__(self):
+        self.wait_loaded()
+        return len(self.lines)
+
+    def count(self, mode=None):
+        self.wait_loaded()
+        return len(self.index[mode])
+
+    def record(self, key):
+        return ScoreRecord.from_line(self.lines[key & ((1 << SEQUENCE_BITS) - 1)])
+
+    def top(self, k=10, mode=None):
+        self.wait_loaded()
+        return [self.record(key) for key in self.index[mode][:k]]
+
+    def best(self, mode=None):
+        self.wait_loaded()
+        keys = self.index[mode]
+        return -(keys[0] >> SEQUENCE_BITS) if keys else None
+
+    def rank(self, score, mode=None):
+        # 1 + number of runs that scored strictly higher
+        self.wait_loaded()
+        return bisect.bisect_left(self.index[mode], index_key(score, 0)) + 1
+
+    def percentile(self, score, mode=None):
+        # Share of runs (0-100) that this score matched or beat
+        self.wait_loaded()
+        keys = self.index[mode]
+        if not keys:
+            return 100.0
+        higher = bisect.bisect_left(keys, index_key(score, 0))
+        return 100.0 * (len(keys) - higher) / len(keys)
@@ -0,0 +1,321 @@
+"""Procedural obstacle levels for OBSTACLES mode.
+
+A pattern (``scatter``, ``walls`` or ``maze``) proposes obstacle cells in
+order, and each one is placed only if the free cells stay connected. Placing
+a cell can only split free space if its free neighbours are not already
+linked around its 8-cell ring; only then does a flood fill decide, and it
+gives up after ``SPLIT_CHECK_BUDGET`` cells. A cell it cannot prove safe
+stays free, so generation is linear in the board size, and a dense level
+(or a tiny board) may come out sparser than asked. The cells around the
+centre spawn are never blocked. The finished level is flood-filled once
+more from the spawn, so every free cell (and so every food) is reachable.
+
+Levels depend only on their parameters and seed. They are kept in memory
+and in ``levels/`` on disk, so a dense level is generated once, not at every
+restart. ``cached_level`` only looks a level up, so callers can generate
+missing ones on a worker thread. File layout: ``b"SNKL" version:u8`` followed by zlib-compressed
+varints ``cols rows count index_deltas...``.
+"""
+import os
+import random
+import threading
+import zlib
+from collections import OrderedDict, deque
+
+from engine import spawn_cell
+from persistence import atomic_write
+from replay import Reader, ReplayError, write_varint
+
+PATTERNS = ['scatter', 'walls', 'maze']
+MAX_DENSITY = 0.6
+# Cells within this Manhattan distance of the spawn stay free
+SPAWN_CLEARANCE = 2
+# Cells a placement check may flood before the cell is skipped as unproven;
+# keeps each check O(1) whatever the board size
+SPLIT_CHECK_BUDGET = 128
+
+CACHE_DIR = 'levels'
+MAGIC = b"SNKL"
+# Bump when generation changes, so cached levels are rebuilt
+GENERATOR_VERSION = 2
+MEMORY_CACHE_SIZE = 8
+memory_cache = OrderedDict()
+# Levels may be generated on a worker thread while the game checks the cache
+cache_lock = threading.Lock()
+
+
+class LevelError(Exception):
+    pass
+
+
+class LevelGenerator:
+    def __init__(self, cols, rows, density, pattern, seed):
+        if pattern not in PATTERNS:
+            raise ValueError(f"Unknown level pattern {pattern!r}")
+        self.cols = cols
+        self.rows = rows
+        self.size = cols * rows
+        self.target = int(min(density, MAX_DENSITY) * self.size)
+        self.pattern = pattern
+        self.rng = random.Random(f"{pattern}:{cols}x{rows}:{seed}")
+        self.blocked = bytearray(self.size)
+        # Ring cells only differ from each other (and the centre) on boards of 3x3 and up
+        self.local_test = cols >= 3 and rows >= 3
+        self.protected = bytearray(self.size)
+        sx, sy = spawn_cell(cols, rows)
+        self.spawn = sy * cols + sx
+        for dx in range(-SPAWN_CLEARANCE, SPAWN_CLEARANCE + 1):
+            reach = SPAWN_CLEARANCE - abs(dx)
+            for dy in range(-reach, reach + 1):
+                self.protected[self.index(sx + dx, sy + dy)] = 1
+
+    def index(self, x, y):
+        # The board wraps around, and so does connectivity
+        return (y % self.rows) * self.cols + x % self.cols
+
+    def neighbours(self, index):
+        # Up, right, down, left, computed without splitting index into x and y
+        cols = self.cols
+        x = index % cols
+        row = index - x
+        return ((index - cols) % self.size, row + (x + 1) % cols,
+                (index + cols) % self.size, row + (x - 1) % cols)
+
+    def ring(self, index):
+        # The 8 surrounding cells in circular order, orthogonal ones at odd positions
+        x, y = index % self.cols, index // self.cols
+        return [self.index(x - 1, y - 1), self.index(x, y - 1), self.index(x + 1, y - 1),
+                self.index(x + 1, y), self.index(x + 1, y + 1), self.index(x, y + 1),
+                self.index(x - 1, y + 1), self.index(x - 1, y)]
+
+    def candidates(self):
+        if self.pattern == 'walls':
+            yield from self.wall_candidates()
+        elif self.pattern == 'maze':
+            yield from self.maze_candidates()
+        # Any pattern tops up with scattered cells to reach the density
+        cells = list(range(self.size))
+        self.rng.shuffle(cells)
+        yield from cells
+
+    def wall_candidates(self):
+        longest = max(3, min(self.cols, self.rows) // 3)
+        for _ in range(self.target):
+            x, y = self.rng.randrange(self.cols), self.rng.randrange(self.rows)
+            dx, dy = self.rng.choice([(1, 0), (0, 1)])
+            for step in range(self.rng.randint(3, longest)):
+                yield self.index(x + dx * step, y + dy * step)
+
+    def maze_candidates(self):
+        # Depth-first maze over the odd cells; the walls left uncarved are
+        # proposed in random order, so lower densities braid the maze
+        rooms_x, rooms_y = range(1, self.cols, 2), range(1, self.rows, 2)
+        walls = {self.index(x, y) for x in range(self.cols) for y in range(self.rows)
+                 if x % 2 == 0 or y % 2 == 0}
+        start = (rooms_x[0], rooms_y[0]) if rooms_x and rooms_y else None
+        seen = {start}
+        stack = [start] if start else []
+        while stack:
+            x, y = stack[-1]
+            options = [(x + dx, y + dy, dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                       if (x + dx, y + dy) not in seen
+                       and 0 < x + dx < self.cols and 0 < y + dy < self.rows]
+            if not options:
+                stack.pop()
+                continue
+            nx, ny, dx, dy = self.rng.choice(options)
+            walls.discard(self.index(x + dx // 2, y + dy // 2))
+            seen.add((nx, ny))
+            stack.append((nx, ny))
+        walls = sorted(walls)
+        self.rng.shuffle(walls)
+        return walls
+
+    def splits_free_space(self, index):
+        # True unless blocking index provably keeps the free cells connected
+        if self.local_test:
+            ring = self.ring(index)
+            free = [not self.blocked[cell] for cell in ring]
+            # Runs of free ring cells are locally connected; count the runs
+            # that touch an orthogonal neighbour
+            groups = 0
+            for position in range(8):
+                if free[position] and not free[position - 1]:
+                    if any(free[p % 8] and p % 2 for p in self.run(free, position)):
+                        groups += 1
+            if all(free) or groups <= 1:
+                return False
+        # On tiny wrapped boards neighbours can coincide, with each other or index
+        targets = list(dict.fromkeys(cell for cell in self.neighbours(index)
+                                     if cell != index and not self.blocked[cell]))
+        return len(targets) > 1 and not self.connected_without(index, targets)
+
+    def run(self, free, start):
+        position = start
+        while free[position % 8] and position < start + 8:
+            yield position
+            position += 1
+
+    def connected_without(self, index, targets):
+        # Grow a flood fill from each free neighbour in lockstep. Fills that
+        # meet are merged (union-find); a fill that runs dry first is a
+        # pocket the new block would seal off. True only once all of them
+        # have met within SPLIT_CHECK_BUDGET cells: sides that are joined
+        # far away cost as much to prove as a split, so they count as one
+        budget = SPLIT_CHECK_BUDGET
+        parent = list(range(len(targets)))
+
+        def find(fill):
+            while parent[fill] != fill:
+                parent[fill] = parent[parent[fill]]
+                fill = parent[fill]
+            return fill
+
+        owner = {index: None}
+        queues = {}
+        for fill, cell in enumerate(targets):
+            owner[cell] = fill
+            queues[fill] = deque([cell])
+        while len(queues) > 1:
+            for root in list(queues):
+                queue = queues.get(root)
+                if queue is None:
+                    continue
+                if not queue or not budget:
+                    return False
+                budget -= 1
+                for neighbour in self.neighbours(queue.popleft()):
+                    if self.blocked[neighbour]:
+                        continue
+                    other = owner.get(neighbour)
+                    if other is None and neighbour != index:
+                        owner[neighbour] = root
+                        queue.append(neighbour)
+                    elif other is not None and find(other) != root:
+                        other = find(other)
+                        # Keep the longer frontier and fold the other into it
+                        if len(queues[other]) > len(queue):
+                            root, other = other, root
+                        parent[other] = root
+                        queues[root].extend(queues.pop(other))
+                        queue = queues[root]
+                        if len(queues) == 1:
+                            return True
+        return True
+
+    def generate(self):
+        placed = []
+        for index in self.candidates():
+            if len(placed) >= self.target:
+                break
+            if self.blocked[index] or self.protected[index] or self.splits_free_space(index):
+                continue
+            self.blocked[index] = 1
+            placed.append(index)
+        if not is_connected(self.cols, self.rows, self.blocked, self.spawn):
+            raise RuntimeError("Generated level is not connected")
+        return sorted(placed)
+
+
+def is_connected(cols, rows, blocked, start):
+    # Flood fill from start over free cells (with wrap-around); True if it reaches them all
+    size = cols * rows
+    seen = bytearray(size)
+    seen[start] = 1
+    queue = deque([start])
+    reached = 1
+    while queue:
+        index = queue.popleft()
+        x, y = index % cols, index // cols
+        for neighbour in ((y - 1) % rows * cols + x, y * cols + (x + 1) % cols,
+                          (y + 1) % rows * cols + x, y * cols + (x - 1) % cols):
+            if not seen[neighbour] and not blocked[neighbour]:
+                seen[neighbour] = 1
+                reached += 1
+                queue.append(neighbour)
+    return reached == size - sum(blocked)
+
+
+def encode_level(cols, rows, indices):
+    body = bytearray()
+    for value in (cols, rows, len(indices)):
+        write_varint(body, value)
+    previous = 0
+    for index in indices:
+        write_varint(body, index - previous)
+        previous = index
+    return MAGIC + bytes([GENERATOR_VERSION]) + zlib.compress(bytes(body))
+
+
+def decode_level(data, cols, rows):
+    if data[:4] != MAGIC or data[4:5] != bytes([GENERATOR_VERSION]):
+        raise LevelError("Not a current level file")
+    try:
+        reader = Reader(zlib.decompress(data[5:]))
+    except zlib.error as e:
+        raise LevelError(f"Corrupt level: {e}")
+    try:
+        if (reader.varint(), reader.varint()) != (cols, rows):
+            raise LevelError("Level size mismatch")
+        indices = []
+        index = 0
+        for _ in range(reader.varint()):
+            index += reader.varint()
+            indices.append(index)
+    except ReplayError:
+        raise LevelError("Truncated level")
+    if indices and indices[-1] >= cols * rows:
+        raise LevelError("Level cell out of range")
+    return indices
+
+
+def level_path(cols, rows, density, pattern, seed, cache_dir=CACHE_DIR):
+    name = f"{pattern}-{cols}x{rows}-d{round(density * 1000)}-s{seed}-v{GENERATOR_VERSION}.lvl"
+    return os.path.join(cache_dir, name)
+
+
+def remember(key, indices):
+    with cache_lock:
+        memory_cache[key] = indices
+        memory_cache.move_to_end(key)
+        if len(memory_cache) > MEMORY_CACHE_SIZE:
+            memory_cache.popitem(last=False)
+
+
+def cached_level(cols, rows, density=0.1, pattern='walls', seed=0, cache_dir=CACHE_DIR):
+    """Obstacle cells for a level from memory or disk, or None if it was never generated."""
+    key = (cols, rows, round(density * 1000), pattern, seed)
+    with cache_lock:
+        indices = memory_cache.get(key)
+    if indices is None:
+        path = level_path(cols, rows, density, pattern, seed, cache_dir)
+        try:
+            with open(path, 'rb') as f:
+                indices = decode_level(f.read(), cols, rows)
+        except (OSError, LevelError):
+            return None
+    remember(key, indices)
+    return [(index % cols, index // cols) for index in indices]
+
+
+def load_level(cols, rows, density=0.1, pattern='walls', seed=0, cache_dir=CACHE_DIR, writer=None):
+    """Obstacle cells for a level, generating and caching it on first use.
+
+    With a ``BackgroundWriter`` the level file is written off the calling thread.
+    """
+    cells = cached_level(cols, rows, density, pattern, seed, cache_dir)
+    if cells is not None:
+        return cells
+    indices = LevelGenerator(cols, rows, density, pattern, seed).generate()
+    path = level_path(cols, rows, density, pattern, seed, cache_dir)
+    data = encode_level(cols, rows, indices)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if writer:
+            writer.write_file(path, data)
+        else:
+            atomic_write(path, data)
+    except OSError as e:
+        print(f"Error caching level: {str(e)}")
+    remember((cols, rows, round(density * 1000), pattern, seed), indices)
+    return [(index % cols, index // cols) for index in indices]
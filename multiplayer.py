@@ -0,0 +1,615 @@
+"""Networked multiplayer: an authoritative asyncio tick server and client.
+
+Each room is a ``Room`` simulation with many snakes on one board, following
+the engine's rules: wrap-around movement, no reversing, death on hitting any
+body or an obstacle unless shielded, food growth and scoring, and timed
+power-ups. One task ticks every room in the process, so hundreds of rooms
+share a single timer and socket writes never wait on each other.
+
+Clients send a JOIN and then direction INPUTs. The server answers the join
+with a WELCOME snapshot of the room. After that, each tick it sends one
+DELTA, encoded once per room and written to every member:
+heads that moved, tails that dropped, snakes that spawned or were removed,
+items added or consumed, and changed scores. ``GameClient`` applies these
+deltas to a mirror of the board.
+
+Frames are a little-endian u32 length and a payload whose first byte is the
+message type; the integers inside are varints (see ``replay``) and cells are
+flat indices.
+
+    python multiplayer.py serve --port 8765
+    python snakegame.py server --port 8765      (same entry point)
+"""
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import struct
+import sys
+from collections import deque
+
+from engine import Direction, Engine, GameMode, PowerUp, PowerUpType, SimState
+from replay import Reader, ReplayError, write_varint
+
+# Client -> server
+MSG_JOIN = 1
+MSG_INPUT = 2
+# Server -> client
+MSG_WELCOME = 1
+MSG_DELTA = 2
+
+FOOD = 0  # item kind; power-ups use their PowerUpType value
+MAX_FRAME = 1 << 22
+FRAME_HEADER = struct.Struct("<I")
+
+
+def write_text(out, text):
+    data = text.encode('utf-8')[:255]
+    write_varint(out, len(data))
+    out += data
+
+
+def read_text(reader):
+    return bytes(reader.take(reader.varint())).decode('utf-8', 'replace')
+
+
+def frame(payload):
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(stream):
+    size, = FRAME_HEADER.unpack(await stream.readexactly(FRAME_HEADER.size))
+    if size == 0 or size > MAX_FRAME:
+        raise ReplayError(f"Bad frame size {size}")
+    return await stream.readexactly(size)
+
+
+class Snake:
+    # One player's snake, shaped like SimState so Engine.turn/move apply to it
+    has_shield = SimState.has_shield
+
+    def __init__(self, player_id, name):
+        self.player_id = player_id
+        self.name = name
+        self.head = None
+        self.direction = None
+        self.snake_list = deque()
+        self.length_of_snake = 1
+        self.score = 0
+        self.alive = False
+        self.respawn_tick = 0
+        self.active_power_ups = []
+        self.inputs = deque(maxlen=3)
+
+    def queue_input(self, direction):
+        if not self.inputs or self.inputs[-1] != direction:
+            self.inputs.append(direction)
+
+
+class Delta:
+    def __init__(self, tick):
+        self.tick = tick
+        self.spawned = []   # (player_id, name, cell)
+        self.removed = []   # (player_id, left)
+        self.moves = []     # (player_id, head cell)
+        self.drops = []     # player_id, once per tail segment dropped
+        self.added = []     # (kind, cell)
+        self.consumed = []  # cell
+        self.scores = []    # (player_id, score)
+
+    def encode(self):
+        out = bytearray([MSG_DELTA])
+        write_varint(out, self.tick)
+        write_varint(out, len(self.spawned))
+        for player_id, name, cell in self.spawned:
+            write_varint(out, player_id)
+            write_text(out, name)
+            write_varint(out, cell)
+        for section in (self.removed, self.moves, self.added, self.scores):
+            write_varint(out, len(section))
+            for a, b in section:
+                write_varint(out, a)
+                write_varint(out, b)
+        for section in (self.drops, self.consumed):
+            write_varint(out, len(section))
+            for value in section:
+                write_varint(out, value)
+        return bytes(out)
+
+
+class Room:
+    def __init__(self, name, cols=60, rows=40, tick_rate=15, food_count=4, obstacle_count=0,
+                 power_up_spawn_interval=10, power_up_duration=5, respawn_seconds=2,
+                 max_players=16, seed=None):
+        self.name = name
+        self.max_players = max_players
+        self.food_count = food_count
+        # Classic rules; the room places its own obstacles below
+        self.engine = Engine(cols, rows, GameMode.CLASSIC, tick_rate=tick_rate,
+                             power_up_spawn_interval=power_up_spawn_interval,
+                             power_up_duration=power_up_duration,
+                             obstacle_count=obstacle_count, seed=seed)
+        self.respawn_ticks = self.engine.ticks(respawn_seconds)
+        self.tick = 0
+        self.snakes = {}
+        self.next_player_id = 1
+        self.leaving = []
+        # Joined since the last tick and still waiting for a snapshot
+        self.welcomes = []
+
+        # Shared board: occupancy, blocked counts and free cells as in the engine
+        self.board = SimState()
+        self.engine.rebuild_cells(self.board)
+        self.items = {}
+        self.power_up_spawn_tick = 0
+        self.obstacles = set()
+        for _ in range(obstacle_count):
+            cell = self.engine.free_cell(self.board)
+            if cell is None:
+                break
+            self.board.obstacles.append(cell)
+            self.obstacles.add(self.engine.cell_index(cell))
+            self.engine.block(self.board, cell)
+        for _ in range(food_count):
+            self.add_item(FOOD, None)
+
+    def is_full(self):
+        return len(self.snakes) >= self.max_players
+
+    def join(self, name):
+        # The snake spawns on the next tick, after the snapshot is taken
+        snake = Snake(self.next_player_id, name)
+        self.next_player_id += 1
+        self.snakes[snake.player_id] = snake
+        self.welcomes.append(snake.player_id)
+        return snake
+
+    def leave(self, player_id):
+        self.leaving.append(player_id)
+
+    def add_item(self, kind, delta):
+        cell = self.engine.free_cell(self.board)
+        if cell is None:
+            return None
+        index = self.engine.cell_index(cell)
+        self.engine.block(self.board, cell)
+        self.items[index] = kind
+        if delta:
+            delta.added.append((kind, index))
+        return index
+
+    def take_item(self, index, delta):
+        kind = self.items.pop(index)
+        self.engine.unblock(self.board, self.engine.cell_at(index))
+        delta.consumed.append(index)
+        return kind
+
+    def spawn(self, snake, delta):
+        cell = self.engine.free_cell(self.board)
+        if cell is None:
+            return
+        snake.head = cell
+        snake.direction = None
+        snake.snake_list = deque([cell])
+        snake.length_of_snake = 1
+        snake.score = 0
+        snake.alive = True
+        snake.active_power_ups = []
+        snake.inputs.clear()
+        self.board.occupancy[self.engine.cell_index(cell)] += 1
+        self.engine.block(self.board, cell)
+        delta.spawned.append((snake.player_id, snake.name, self.engine.cell_index(cell)))
+
+    def clear_body(self, snake):
+        for cell in snake.snake_list:
+            self.board.occupancy[self.engine.cell_index(cell)] -= 1
+            self.engine.unblock(self.board, cell)
+        snake.snake_list.clear()
+
+    def kill(self, snake, delta):
+        snake.alive = False
+        snake.respawn_tick = self.tick + self.respawn_ticks
+        self.clear_body(snake)
+        delta.removed.append((snake.player_id, 0))
+
+    def update_power_ups(self, delta):
+        tick = self.tick
+        for snake in self.snakes.values():
+            snake.active_power_ups = [p for p in snake.active_power_ups if not p.is_expired(tick)]
+
+        has_power_up = any(kind != FOOD for kind in self.items.values())
+        rng = self.engine.rng
+        if (not has_power_up and
+                tick - self.power_up_spawn_tick > self.engine.ticks(self.engine.power_up_spawn_interval)
+                and rng.random() < 0.3):
+            self.add_item(rng.choice(list(PowerUpType)).value, delta)
+
+    def step(self):
+        engine, board = self.engine, self.board
+        occupancy = board.occupancy
+        cell_index = engine.cell_index
+        self.tick += 1
+        board.changed_cells = []
+        delta = Delta(self.tick)
+
+        for player_id in self.leaving:
+            snake = self.snakes.pop(player_id, None)
+            if snake is None:
+                continue
+            if snake.alive:
+                self.clear_body(snake)
+            delta.removed.append((player_id, 1))
+        self.leaving = []
+
+        moving = []
+        for snake in self.snakes.values():
+            if not snake.alive:
+                if self.tick >= snake.respawn_tick:
+                    self.spawn(snake, delta)
+                continue
+            engine.turn(snake, snake.inputs.popleft() if snake.inputs else None)
+            if snake.direction is None:
+                continue
+            engine.move(snake)
+            moving.append(snake)
+            delta.moves.append((snake.player_id, cell_index(snake.head)))
+
+        for snake in moving:
+            snake.snake_list.append(snake.head)
+            occupancy[cell_index(snake.head)] += 1
+            engine.block(board, snake.head)
+            if len(snake.snake_list) > snake.length_of_snake:
+                tail = snake.snake_list.popleft()
+                occupancy[cell_index(tail)] -= 1
+                engine.unblock(board, tail)
+                delta.drops.append(snake.player_id)
+
+        # Spawn only once every head blocks its cell, so nothing appears
+        # under a snake and is consumed in the same delta
+        self.update_power_ups(delta)
+
+        # Decide every collision before removing any body, so head-on
+        # crashes take out both snakes
+        dead = [snake for snake in moving
+                if (occupancy[cell_index(snake.head)] > 1 or cell_index(snake.head) in self.obstacles)
+                and not snake.has_shield()]
+        for snake in dead:
+            self.kill(snake, delta)
+
+        for snake in moving:
+            index = cell_index(snake.head)
+            if not snake.alive or index not in self.items:
+                continue
+            kind = self.take_item(index, delta)
+            if kind == FOOD:
+                snake.length_of_snake += 1
+                snake.score += 10
+                delta.scores.append((snake.player_id, snake.score))
+                self.add_item(FOOD, delta)
+            else:
+                power_up = PowerUp(PowerUpType(kind), snake.head, engine.ticks(engine.power_up_duration))
+                power_up.activate(self.tick)
+                snake.active_power_ups.append(power_up)
+                self.power_up_spawn_tick = self.tick
+        return delta
+
+    def encode_snapshot(self):
+        out = bytearray()
+        for value in (self.tick, self.engine.cols, self.engine.rows, self.engine.tick_rate):
+            write_varint(out, value)
+        write_varint(out, len(self.obstacles))
+        for index in self.obstacles:
+            write_varint(out, index)
+        write_varint(out, len(self.items))
+        for index, kind in self.items.items():
+            write_varint(out, kind)
+            write_varint(out, index)
+        write_varint(out, len(self.snakes))
+        for snake in self.snakes.values():
+            write_varint(out, snake.player_id)
+            write_text(out, snake.name)
+            write_varint(out, snake.score)
+            write_varint(out, len(snake.snake_list))
+            for cell in snake.snake_list:
+                write_varint(out, self.engine.cell_index(cell))
+        return bytes(out)
+
+
+class GameServer:
+    def __init__(self, host='127.0.0.1', port=8765, tick_rate=15, room_options=None,
+                 max_buffer=256 * 1024):
+        self.host = host
+        self.port = port
+        self.tick_rate = tick_rate
+        self.room_options = dict(room_options or {}, tick_rate=tick_rate)
+        # Clients whose unsent output grows past this are disconnected
+        self.max_buffer = max_buffer
+        self.rooms = {}
+        self.connections = {}
+        self.server = None
+        self.ticker = None
+        self.handlers = set()
+        self.tick_times = deque(maxlen=1000)
+        self.overruns = 0
+        self.rng = random.Random()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ticker = asyncio.create_task(self.tick_loop())
+
+    async def close(self):
+        if self.ticker:
+            self.ticker.cancel()
+        if self.server:
+            self.server.close()
+            for task in list(self.handlers):
+                task.cancel()
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+            await self.server.wait_closed()
+
+    def get_room(self, name):
+        # Full rooms overflow into numbered rooms of the same name
+        base, suffix = name, 1
+        while name in self.rooms and self.rooms[name].is_full():
+            suffix += 1
+            name = f"{base}#{suffix}"
+        room = self.rooms.get(name)
+        if room is None:
+            room = Room(name, seed=self.rng.getrandbits(32), **self.room_options)
+            self.rooms[name] = room
+        return room
+
+    async def handle_client(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        room = snake = None
+        try:
+            message = Reader(await read_frame(reader))
+            if message.take(1)[0] != MSG_JOIN:
+                return
+            room = self.get_room(read_text(message))
+            snake = room.join(read_text(message))
+            self.connections[(room.name, snake.player_id)] = writer
+            while True:
+                message = Reader(await read_frame(reader))
+                if message.take(1)[0] == MSG_INPUT:
+                    snake.queue_input(Direction(message.varint()))
+        except (asyncio.IncompleteReadError, ConnectionError, ReplayError, ValueError, IndexError,
+                asyncio.CancelledError):
+            # Disconnects, malformed frames and server shutdown all just drop the client
+            pass
+        finally:
+            if snake:
+                room.leave(snake.player_id)
+                self.connections.pop((room.name, snake.player_id), None)
+            self.handlers.discard(task)
+            writer.close()
+
+    def send(self, room, player_id, data):
+        writer = self.connections.get((room.name, player_id))
+        if writer is None or writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            # A client this far behind cannot catch up; its handler cleans up
+            writer.close()
+            return
+        writer.write(data)
+
+    def step_room(self, room):
+        if room.welcomes:
+            snapshot = room.encode_snapshot()
+            for player_id in room.welcomes:
+                payload = bytearray([MSG_WELCOME])
+                write_varint(payload, player_id)
+                self.send(room, player_id, frame(bytes(payload) + snapshot))
+            room.welcomes = []
+        data = frame(room.step().encode())
+        for player_id in room.snakes:
+            self.send(room, player_id, data)
+
+    async def tick_loop(self):
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.tick_rate
+        next_tick = loop.time()
+        while True:
+            start = loop.time()
+            for name, room in list(self.rooms.items()):
+                if not room.snakes and not room.leaving:
+                    del self.rooms[name]
+                    continue
+                self.step_room(room)
+            now = loop.time()
+            self.tick_times.append(now - start)
+            next_tick += interval
+            if next_tick < now:
+                # Fell behind: skip the missed ticks rather than bursting them
+                self.overruns += 1
+                next_tick = now
+            await asyncio.sleep(next_tick - now)
+
+    def stats(self):
+        times = sorted(self.tick_times) or [0.0]
+        return {
+            'rooms': len(self.rooms),
+            'players': sum(len(room.snakes) for room in self.rooms.values()),
+            'tick_p50_ms': statistics.median(times) * 1000,
+            'tick_p99_ms': times[min(len(times) - 1, int(0.99 * len(times)))] * 1000,
+            'overruns': self.overruns
+        }
+
+
+class ClientSnake:
+    def __init__(self, name):
+        self.name = name
+        self.body = deque()
+        self.score = 0
+        self.alive = False
+
+
+class GameClient:
+    # Mirrors a room from the server's snapshot and deltas
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.player_id = None
+        self.cols = self.rows = 0
+        self.tick_rate = 0
+        self.tick = 0
+        self.obstacles = set()
+        self.items = {}
+        self.snakes = {}
+        self.occupied = {}
+        self.bytes_received = 0
+
+    async def connect(self, host, port, room="lobby", name="Player"):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        sock = self.writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        out = bytearray([MSG_JOIN])
+        write_text(out, room)
+        write_text(out, name)
+        self.writer.write(frame(bytes(out)))
+        while await self.receive() != MSG_WELCOME:
+            pass
+
+    def send_input(self, direction):
+        self.writer.write(frame(bytes([MSG_INPUT, direction.value])))
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def receive(self):
+        payload = await read_frame(self.reader)
+        self.bytes_received += len(payload) + FRAME_HEADER.size
+        message = Reader(payload)
+        kind = message.take(1)[0]
+        if kind == MSG_WELCOME:
+            self.apply_snapshot(message)
+        elif kind == MSG_DELTA:
+            self.apply_delta(message)
+        return kind
+
+    def occupy(self, index, amount):
+        count = self.occupied.get(index, 0) + amount
+        if count:
+            self.occupied[index] = count
+        else:
+            del self.occupied[index]
+
+    def apply_snapshot(self, message):
+        self.player_id = message.varint()
+        self.tick, self.cols, self.rows, self.tick_rate = (message.varint() for _ in range(4))
+        self.obstacles = {message.varint() for _ in range(message.varint())}
+        self.items = {}
+        for _ in range(message.varint()):
+            kind = message.varint()
+            self.items[message.varint()] = kind
+        self.snakes = {}
+        self.occupied = {}
+        for _ in range(message.varint()):
+            player_id = message.varint()
+            snake = ClientSnake(read_text(message))
+            snake.score = message.varint()
+            snake.body.extend(message.varint() for _ in range(message.varint()))
+            snake.alive = bool(snake.body)
+            for index in snake.body:
+                self.occupy(index, 1)
+            self.snakes[player_id] = snake
+
+    def remove_body(self, snake):
+        for index in snake.body:
+            self.occupy(index, -1)
+        snake.body.clear()
+        snake.alive = False
+
+    def apply_delta(self, message):
+        # Sections are applied in the order the server produced them
+        self.tick = message.varint()
+        spawned = [(message.varint(), read_text(message), message.varint())
+                   for _ in range(message.varint())]
+        removed, moves, added, scores = [
+            [(message.varint(), message.varint()) for _ in range(message.varint())]
+            for _ in range(4)]
+        drops, consumed = [[message.varint() for _ in range(message.varint())] for _ in range(2)]
+
+        for player_id, left in removed:
+            snake = self.snakes.get(player_id)
+            if snake and left:
+                self.remove_body(snake)
+                del self.snakes[player_id]
+        for player_id, name, index in spawned:
+            snake = self.snakes.setdefault(player_id, ClientSnake(name))
+            snake.body = deque([index])
+            snake.score = 0
+            snake.alive = True
+            self.occupy(index, 1)
+        for player_id, index in moves:
+            self.snakes[player_id].body.append(index)
+            self.occupy(index, 1)
+        for player_id in drops:
+            self.occupy(self.snakes[player_id].body.popleft(), -1)
+        for player_id, left in removed:
+            if not left:
+                self.remove_body(self.snakes[player_id])
+        for index in consumed:
+            self.items.pop(index, None)
+        for kind, index in added:
+            self.items[index] = kind
+        for player_id, score in scores:
+            self.snakes[player_id].score = score
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run the multiplayer snake server.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve = subparsers.add_parser('serve')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--tick-rate', type=int, default=15, help="ticks per second")
+    serve.add_argument('--cols', type=int, default=60)
+    serve.add_argument('--rows', type=int, default=40)
+    serve.add_argument('--food', type=int, default=4, help="food items per room")
+    serve.add_argument('--obstacles', type=int, default=0)
+    serve.add_argument('--max-players', type=int, default=16, help="players per room")
+    serve.add_argument('--stats', type=float, default=0, help="print stats every N seconds")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    server = GameServer(args.host, args.port, args.tick_rate, {
+        'cols': args.cols, 'rows': args.rows, 'food_count': args.food,
+        'obstacle_count': args.obstacles, 'max_players': args.max_players
+    })
+    await server.start()
+    print(f"Serving on {args.host}:{server.port}", flush=True)
+    try:
+        while True:
+            await asyncio.sleep(args.stats or 3600)
+            if args.stats:
+                print(server.stats(), flush=True)
+    finally:
+        print(server.stats(), flush=True)
+        await server.close()
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
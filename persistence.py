@@ -0,0 +1,102 @@
+"""Crash-safe file writes done off the frame loop.
+
+``BackgroundWriter`` owns a worker thread. Whole-file writes are coalesced
+per path (only the newest content is written) and committed atomically by
+writing a temp file, fsyncing it and renaming it over the target. Appends
+to the same file are batched into one write and one fsync.
+"""
+import os
+import threading
+import time
+
+
+def atomic_write(path, data):
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def append_lines(path, lines):
+    with open(path, 'a') as f:
+        f.write(''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class BackgroundWriter:
+    def __init__(self, coalesce_delay=0.05):
+        self.coalesce_delay = coalesce_delay
+        self.pending_writes = {}
+        self.pending_appends = {}
+        self.busy = False
+        self.closing = False
+        self.flush_requested = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="BackgroundWriter", daemon=True)
+        self.thread.start()
+
+    def write_file(self, path, data):
+        with self.condition:
+            self.pending_writes[path] = data
+            self.condition.notify_all()
+
+    def append(self, path, text):
+        with self.condition:
+            self.pending_appends.setdefault(path, []).append(text)
+            self.condition.notify_all()
+
+    def has_pending(self):
+        return bool(self.pending_writes or self.pending_appends)
+
+    def flush(self):
+        # Block until everything queued so far is on disk
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+            while self.has_pending() or self.busy:
+                self.condition.wait()
+            self.flush_requested = False
+
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.has_pending() and not self.closing:
+                    self.condition.wait()
+                if not self.has_pending() and self.closing:
+                    return
+                # Give a burst of saves a moment to coalesce into one commit
+                deadline = time.monotonic() + self.coalesce_delay
+                while not (self.closing or self.flush_requested):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                self.flush_requested = False
+                writes, self.pending_writes = self.pending_writes, {}
+                appends, self.pending_appends = self.pending_appends, {}
+                self.busy = True
+
+            for path, lines in appends.items():
+                try:
+                    append_lines(path, lines)
+                except OSError as e:
+                    print(f"Error appending to {path}: {str(e)}")
+            for path, data in writes.items():
+                try:
+                    atomic_write(path, data)
+                except OSError as e:
+                    print(f"Error writing {path}: {str(e)}")
+
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
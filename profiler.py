@@ -0,0 +1,178 @@
+"""Opt-in per-phase timing for the frame loop.
+
+Phases are measured by wrapping the methods and module functions that
+implement them. ``Profiler.hook(owner, name, phase)`` registers a target,
+but nothing is wrapped until ``enable()``, and ``disable()`` puts the
+originals back. A disabled profiler therefore adds no calls to the hot path.
+
+Every timed call becomes a span. ``end_frame`` sums each frame's spans per
+phase into rolling windows; ``percentiles`` reads p50/p99 from those
+windows. While recording, frames and spans are also kept, up to a cap,
+for ``to_csv`` (one row per frame) and ``to_chrome_trace`` (load the JSON
+in chrome://tracing or Perfetto). ``begin_frame`` discards spans from
+outside the frame loop, such as menus.
+"""
+import csv
+import io
+import json
+import threading
+import time
+from collections import deque
+
+PHASES = ['input', 'movement', 'collision', 'power_ups', 'achievements', 'draw', 'flip',
+          'tick_wait', 'font_render', 'file_io']
+
+# Spans kept for the Chrome trace; frames keep counting once this fills up
+MAX_TRACE_SPANS = 500000
+# Frames kept for the CSV (ten minutes at 60 fps); later frames are not recorded
+MAX_RECORDED_FRAMES = 36000
+
+
+class Profiler:
+    def __init__(self, window=240):
+        self.window = window
+        self.enabled = False
+        self.recording = False
+        self.hooks = {}
+        self.spans = []
+        self.samples = {}
+        self.frames = []
+        self.trace = []
+        self.frame_index = 0
+        self.frame_start = time.perf_counter()
+        self.origin = self.frame_start
+
+    def hook(self, owner, name, phase):
+        key = (id(owner), name)
+        if key in self.hooks:
+            return
+        # Instance methods live on the class; restoring means deleting the wrapper
+        own = name in getattr(owner, '__dict__', {})
+        self.hooks[key] = (owner, name, phase, getattr(owner, name), own)
+        if self.enabled:
+            self.wrap(key)
+
+    def unhook(self, owner):
+        for key in [key for key in self.hooks if key[0] == id(owner)]:
+            if self.enabled:
+                self.unwrap(key)
+            del self.hooks[key]
+
+    def wrap(self, key):
+        owner, name, phase, original, _ = self.hooks[key]
+        setattr(owner, name, self.timed(original, phase))
+
+    def unwrap(self, key):
+        owner, name, _, original, own = self.hooks[key]
+        if own:
+            setattr(owner, name, original)
+        else:
+            delattr(owner, name)
+
+    def timed(self, function, phase):
+        clock = time.perf_counter
+        get_ident = threading.get_ident
+
+        def timed_call(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                # list.append is atomic, so worker threads may record too
+                self.spans.append((phase, start, clock() - start, get_ident()))
+        return timed_call
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        for key in self.hooks:
+            self.wrap(key)
+        self.spans = []
+        self.frame_start = time.perf_counter()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        for key in self.hooks:
+            self.unwrap(key)
+        self.enabled = False
+        self.recording = False
+
+    def start_recording(self):
+        self.enable()
+        self.recording = True
+        self.frames = []
+        self.trace = []
+
+    def stop_recording(self):
+        self.recording = False
+
+    def begin_frame(self):
+        # Start timing a frame afresh, dropping spans recorded since the last
+        # one (such as time spent in menus) so they do not count towards it
+        self.spans = []
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        now = time.perf_counter()
+        spans, self.spans = self.spans, []
+        totals = dict.fromkeys(PHASES, 0.0)
+        for phase, _, duration, _ in spans:
+            totals[phase] = totals.get(phase, 0.0) + duration
+        frame_time = now - self.frame_start
+
+        for phase, total in totals.items():
+            window = self.samples.get(phase)
+            if window is None:
+                window = self.samples[phase] = deque(maxlen=self.window)
+            window.append(total)
+        self.samples.setdefault('frame', deque(maxlen=self.window)).append(frame_time)
+
+        if self.recording and len(self.frames) < MAX_RECORDED_FRAMES:
+            self.frames.append((self.frame_index, self.frame_start, frame_time, totals))
+            if len(self.trace) < MAX_TRACE_SPANS:
+                self.trace.append(('frame', self.frame_start, frame_time, threading.get_ident()))
+                self.trace.extend(spans)
+        self.frame_index += 1
+        self.frame_start = now
+
+    def percentiles(self):
+        # phase -> (p50, p99) in milliseconds over the rolling window
+        result = {}
+        for phase, window in self.samples.items():
+            values = sorted(window)
+            if values:
+                result[phase] = (values[len(values) // 2] * 1000,
+                                 values[min(len(values) - 1, int(0.99 * len(values)))] * 1000)
+        return result
+
+    def overlay_rows(self):
+        # (label, p50, p99) strings for an on-screen table
+        stats = self.percentiles()
+        rows = [('phase', 'p50', 'p99')]
+        for phase in ['frame'] + PHASES:
+            if phase in stats:
+                p50, p99 = stats[phase]
+                rows.append((phase, f"{p50:.2f}", f"{p99:.2f}"))
+        if self.recording:
+            full = len(self.frames) >= MAX_RECORDED_FRAMES
+            rows.append(('REC', str(len(self.frames)), 'full' if full else 'frames'))
+        return rows
+
+    def to_csv(self):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        phases = sorted({phase for frame in self.frames for phase in frame[3]},
+                        key=lambda p: (PHASES + [p]).index(p))
+        writer.writerow(['frame', 'start_ms', 'frame_ms'] + [f"{p}_ms" for p in phases])
+        for index, start, frame_time, totals in self.frames:
+            writer.writerow([index, f"{(start - self.origin) * 1000:.3f}", f"{frame_time * 1000:.3f}"] +
+                            [f"{totals.get(p, 0.0) * 1000:.3f}" for p in phases])
+        return out.getvalue()
+
+    def to_chrome_trace(self):
+        events = [{'name': phase, 'ph': 'X', 'pid': 0, 'tid': thread,
+                   'ts': round((start - self.origin) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+                  for phase, start, duration, thread in self.trace]
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
@@ -0,0 +1,295 @@
+"""Compact binary replays of engine runs.
+
+A replay stores the engine configuration and seed, the per-tick snake
+direction as run-length encoded 2-bit codes, and a keyframe snapshot every
+``keyframe_interval`` ticks. Since the engine is deterministic, any tick can
+be rebuilt by restoring the nearest earlier keyframe and re-simulating at
+most one interval of inputs.
+
+Layout (all integers are unsigned LEB128 varints unless noted)::
+
+    b"SNKR" version:u8
+    seed cols rows mode tick_rate obstacle_count food_count max_power_ups
+    time_limit power_up_spawn_interval power_up_duration      (3 x f64)
+    total_ticks idle_ticks run_count runs...                   run = length << 2 | direction
+    keyframe_count (byte_length keyframe_bytes)...
+    -- the whole body after the version byte is zlib-compressed
+
+Keyframes hold the board contents and RNG state. Free cells are sampled
+from the board alone, so they can be rebuilt from it. Keyframes are encoded
+on a worker thread, so recording never stalls the frame loop.
+
+Older files are still read: version 2 keyframes also carry the free-cell
+order the engine sampled from then, and version 1 additionally has one
+food and at most one power-up per snapshot, with no food_count or
+max_power_ups.
+"""
+import bisect
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import Direction, Engine, GameMode, PowerUpType
+
+MAGIC = b"SNKR"
+VERSION = 3
+NO_DIRECTION = 4
+
+# One worker keeps keyframes encoding in order, off the frame thread
+encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ReplayEncoder")
+
+
+class ReplayError(Exception):
+    pass
+
+
+def write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def varint(self):
+        result = 0
+        shift = 0
+        while True:
+            if self.pos >= len(self.data):
+                raise ReplayError("Truncated replay")
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def unpack(self, fmt):
+        size = struct.calcsize(fmt)
+        if self.pos + size > len(self.data):
+            raise ReplayError("Truncated replay")
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += size
+        return values
+
+    def take(self, size):
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+
+def encode_snapshot(engine, snapshot):
+    out = bytearray()
+    cell = engine.cell_index
+
+    def cells(values):
+        write_varint(out, len(values))
+        for value in values:
+            write_varint(out, cell(value))
+
+    direction = snapshot['direction']
+    for value in (snapshot['tick'], snapshot['score'], int(snapshot['alive']),
+                  snapshot['length_of_snake'],
+                  NO_DIRECTION if direction is None else direction.value,
+                  cell(snapshot['head']), snapshot['power_up_spawn_tick']):
+        write_varint(out, value)
+    cells(snapshot['snake'])
+    cells(snapshot['obstacles'])
+    cells(snapshot['foods'])
+
+    write_varint(out, len(snapshot['power_ups']))
+    for power_up_type, position in snapshot['power_ups']:
+        write_varint(out, power_up_type.value)
+        write_varint(out, cell(position))
+    write_varint(out, len(snapshot['active_power_ups']))
+    for power_up_type, position, start_tick, duration in snapshot['active_power_ups']:
+        for value in (power_up_type.value, cell(position), start_tick, duration):
+            write_varint(out, value)
+
+    version, internal, gauss_next = snapshot['rng']
+    write_varint(out, version)
+    write_varint(out, len(internal))
+    out += struct.pack(f"<{len(internal)}I", *internal)
+    if gauss_next is None:
+        out.append(0)
+    else:
+        out.append(1)
+        out += struct.pack("<d", gauss_next)
+    return bytes(out)
+
+
+def decode_snapshot(engine, data, version=VERSION):
+    reader = Reader(data)
+    cell = engine.cell_at
+
+    def cells():
+        return [cell(reader.varint()) for _ in range(reader.varint())]
+
+    snapshot = {}
+    snapshot['tick'] = reader.varint()
+    snapshot['score'] = reader.varint()
+    snapshot['alive'] = bool(reader.varint())
+    snapshot['length_of_snake'] = reader.varint()
+    direction = reader.varint()
+    snapshot['direction'] = None if direction == NO_DIRECTION else Direction(direction)
+    snapshot['head'] = cell(reader.varint())
+    if version == 1:
+        food = reader.varint()
+        snapshot['foods'] = [] if food == 0 else [cell(food - 1)]
+    snapshot['power_up_spawn_tick'] = reader.varint()
+    snapshot['snake'] = cells()
+    snapshot['obstacles'] = cells()
+
+    if version == 1:
+        power_up_type = reader.varint()
+        snapshot['power_ups'] = ([(PowerUpType(power_up_type), cell(reader.varint()))]
+                                 if power_up_type else [])
+    else:
+        snapshot['foods'] = cells()
+        snapshot['power_ups'] = [(PowerUpType(reader.varint()), cell(reader.varint()))
+                                 for _ in range(reader.varint())]
+    snapshot['active_power_ups'] = []
+    for _ in range(reader.varint()):
+        power_up_type = PowerUpType(reader.varint())
+        position = cell(reader.varint())
+        snapshot['active_power_ups'].append(
+            (power_up_type, position, reader.varint(), reader.varint()))
+
+    if version < 3:
+        snapshot['free_cells'] = [reader.varint() for _ in range(reader.varint())]
+
+    rng_version = reader.varint()
+    internal = reader.unpack(f"<{reader.varint()}I")
+    gauss_next = reader.unpack("<d")[0] if reader.take(1) == b"\x01" else None
+    snapshot['rng'] = (rng_version, internal, gauss_next)
+    return snapshot
+
+
+class ReplayRecorder:
+    def __init__(self, engine, state, keyframe_interval=900):
+        self.engine = engine
+        self.keyframe_interval = keyframe_interval
+        self.idle_ticks = 0
+        self.runs = []  # [direction value, length]
+        self.total_ticks = state.tick
+        # Futures of encoded keyframes
+        self.keyframes = []
+        self.add_keyframe(state)
+
+    def add_keyframe(self, state):
+        # Taking the snapshot is cheap; encoding it runs on the worker
+        self.keyframes.append(encoder.submit(encode_snapshot, self.engine, self.engine.snapshot(state)))
+
+    def record(self, state):
+        # Call after every Engine.step
+        self.total_ticks = state.tick
+        if state.direction is None:
+            self.idle_ticks += 1
+        elif self.runs and self.runs[-1][0] == state.direction.value:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([state.direction.value, 1])
+
+        if state.tick % self.keyframe_interval == 0 and state.alive:
+            self.add_keyframe(state)
+
+    def to_bytes(self):
+        engine = self.engine
+        body = bytearray()
+        for value in (engine.seed, engine.cols, engine.rows, engine.game_mode.value,
+                      engine.tick_rate, engine.obstacle_count, engine.food_count,
+                      engine.max_power_ups):
+            write_varint(body, value)
+        body += struct.pack("<3d", engine.time_limit, engine.power_up_spawn_interval,
+                            engine.power_up_duration)
+        write_varint(body, self.total_ticks)
+        write_varint(body, self.idle_ticks)
+        write_varint(body, len(self.runs))
+        for direction, length in self.runs:
+            write_varint(body, length << 2 | direction)
+        write_varint(body, len(self.keyframes))
+        for future in self.keyframes:
+            keyframe = future.result()
+            write_varint(body, len(keyframe))
+            body += keyframe
+        return MAGIC + bytes([VERSION]) + zlib.compress(bytes(body), 9)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+
+class ReplayPlayer:
+    def __init__(self, data):
+        if data[:4] != MAGIC:
+            raise ReplayError("Not a snake replay")
+        if not 1 <= data[4] <= VERSION:
+            raise ReplayError(f"Unsupported replay version {data[4]}")
+        self.version = data[4]
+        try:
+            reader = Reader(zlib.decompress(data[5:]))
+        except zlib.error as e:
+            raise ReplayError(f"Corrupt replay: {e}")
+
+        seed, cols, rows, mode, tick_rate, obstacle_count = (reader.varint() for _ in range(6))
+        food_count, max_power_ups = (reader.varint(), reader.varint()) if self.version > 1 else (1, 1)
+        time_limit, spawn_interval, power_up_duration = reader.unpack("<3d")
+        self.engine = Engine(cols, rows, GameMode(mode), tick_rate=tick_rate,
+                             time_limit=time_limit,
+                             power_up_spawn_interval=spawn_interval,
+                             power_up_duration=power_up_duration,
+                             obstacle_count=obstacle_count, food_count=food_count,
+                             max_power_ups=max_power_ups, seed=seed,
+                             legacy_sampling=self.version < 3)
+
+        self.total_ticks = reader.varint()
+        self.idle_ticks = reader.varint()
+        # Runs are indexed by their first tick for O(log runs) lookups
+        self.run_starts = []
+        self.run_directions = []
+        tick = self.idle_ticks + 1
+        for _ in range(reader.varint()):
+            value = reader.varint()
+            self.run_starts.append(tick)
+            self.run_directions.append(Direction(value & 3))
+            tick += value >> 2
+
+        self.keyframes = []
+        for _ in range(reader.varint()):
+            self.keyframes.append(reader.take(reader.varint()))
+        self.keyframe_ticks = [decode_snapshot(self.engine, keyframe, self.version)['tick']
+                               for keyframe in self.keyframes]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def action_at(self, tick):
+        # The direction the snake moved on the step that produced this tick
+        if tick <= self.idle_ticks or not self.run_starts:
+            return None
+        return self.run_directions[bisect.bisect_right(self.run_starts, tick) - 1]
+
+    def seek(self, tick):
+        tick = max(0, min(tick, self.total_ticks))
+        index = bisect.bisect_right(self.keyframe_ticks, tick) - 1
+        state = self.engine.restore(decode_snapshot(self.engine, self.keyframes[index], self.version))
+        while state.tick < tick:
+            self.engine.step(state, self.action_at(state.tick + 1))
+        return state
+
+    def play(self, start_tick=0):
+        # Yields the state after every tick from start_tick to the end
+        state = self.seek(start_tick)
+        yield state
+        while state.tick < self.total_ticks:
+            self.engine.step(state, self.action_at(state.tick + 1))
+            yield state
+
+    def final_state(self):
+        return self.seek(self.total_ticks)
@@ -0,0 +1,148 @@
+"""Gymnasium environment over the headless engine.
+
+Observations are read-only NumPy views that stay valid for the whole episode
+and are updated in place, never rebuilt:
+
+* ``body`` is a (rows, cols) int32 view straight over the engine's
+  occupancy grid: segments per cell, 2+ where a shield lets them overlap.
+* ``planes`` is a (4, rows, cols) uint8 stack of head, food, obstacle and
+  power-up cells. Each step only touches the cells the engine reports in
+  ``state.changed_cells``.
+* ``features`` is a float32 vector (see ``FEATURES``): length, score, ticks
+  left on each power-up type and the time-trial seconds remaining.
+
+Since the arrays are live, copy an observation if it has to outlive the
+next ``step``, or pass ``copy_observations=True`` for fresh arrays per call
+(what ``gymnasium.utils.env_checker`` insists on). Actions are
+``Direction`` values; reversing is ignored as in the game. Requires NumPy
+and Gymnasium.
+
+    env = gymnasium.make("Snake-v0", cols=20, rows=20)
+"""
+import gymnasium
+import numpy as np
+from gymnasium import spaces
+
+from engine import SOLO_MODES, Direction, Engine, GameEvent, GameMode, ItemKind, PowerUp, PowerUpType
+
+HEAD, FOOD, OBSTACLE, POWER_UP = range(4)
+FEATURES = (['length', 'score'] + [f"{t.name.lower()}_ticks" for t in PowerUpType] +
+            ['time_remaining'])
+
+
+def read_only(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class SnakeEnv(gymnasium.Env):
+    metadata = {'render_modes': []}
+
+    def __init__(self, cols=20, rows=20, game_mode=GameMode.CLASSIC, tick_rate=15,
+                 obstacle_count=5, power_up_spawn_interval=10, food_count=None,
+                 max_power_ups=None, max_steps=10000, death_penalty=-10.0,
+                 copy_observations=False):
+        if game_mode not in SOLO_MODES:
+            raise ValueError(f"{game_mode.name} is not a single-player mode")
+        self.cols = cols
+        self.rows = rows
+        self.engine_options = {
+            'game_mode': game_mode, 'tick_rate': tick_rate, 'obstacle_count': obstacle_count,
+            'power_up_spawn_interval': power_up_spawn_interval, 'food_count': food_count,
+            'max_power_ups': max_power_ups
+        }
+        self.max_steps = max_steps
+        self.death_penalty = death_penalty
+        self.copy_observations = copy_observations
+        self.engine = None
+        self.state = None
+
+        self.action_space = spaces.Discrete(len(Direction))
+        self.observation_space = spaces.Dict({
+            'body': spaces.Box(0, np.iinfo(np.int32).max, (rows, cols), np.int32),
+            'planes': spaces.Box(0, 1, (4, rows, cols), np.uint8),
+            'features': spaces.Box(0, np.inf, (len(FEATURES),), np.float32)
+        })
+
+        self.planes = np.zeros((4, rows * cols), dtype=np.uint8)
+        self.features = np.zeros(len(FEATURES), dtype=np.float32)
+        self.observation = None
+        self.head_index = None
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        if self.engine is None or seed is not None:
+            self.engine = Engine(self.cols, self.rows, seed=int(self.np_random.integers(2 ** 32)),
+                                 **self.engine_options)
+        self.state = self.engine.reset()
+
+        # Once per episode: the occupancy grid is reallocated by reset
+        self.planes.fill(0)
+        for cell in self.state.obstacles:
+            self.planes[OBSTACLE, self.engine.cell_index(cell)] = 1
+        self.head_index = self.engine.cell_index(self.state.head)
+        self.planes[HEAD, self.head_index] = 1
+        for index in self.state.items:
+            self.mark(self.engine.cell_at(index))
+        body = np.frombuffer(self.state.occupancy, dtype=np.int32).reshape(self.rows, self.cols)
+        self.observation = {
+            'body': read_only(body),
+            'planes': read_only(self.planes.reshape(4, self.rows, self.cols)),
+            'features': read_only(self.features)
+        }
+        self.update_features()
+        return self.observe(), {}
+
+    def step(self, action):
+        state = self.state
+        score = state.score
+        self.engine.step(state, Direction(int(action)))
+
+        planes = self.planes
+        for cell in state.changed_cells:
+            index = self.engine.cell_index(cell)
+            planes[FOOD, index] = 0
+            planes[POWER_UP, index] = 0
+            self.mark(cell)
+        planes[HEAD, self.head_index] = 0
+        self.head_index = self.engine.cell_index(state.head)
+        planes[HEAD, self.head_index] = 1
+        self.update_features()
+
+        reward = float(state.score - score)
+        time_up = GameEvent.TIME_UP in state.events
+        terminated = not state.alive and not time_up
+        if terminated:
+            reward += self.death_penalty
+        truncated = time_up or state.tick >= self.max_steps
+        return self.observe(), reward, terminated, truncated, {'events': state.events}
+
+    def observe(self):
+        if self.copy_observations:
+            return {key: view.copy() for key, view in self.observation.items()}
+        return self.observation
+
+    def mark(self, cell):
+        # Set the food/power-up plane for a cell from the engine state
+        index = self.engine.cell_index(cell)
+        item = self.state.items.get(index)
+        if item is ItemKind.FOOD:
+            self.planes[FOOD, index] = 1
+        elif isinstance(item, PowerUp):
+            self.planes[POWER_UP, index] = 1
+
+    def update_features(self):
+        state = self.state
+        features = self.features
+        features[0] = state.length_of_snake
+        features[1] = state.score
+        features[2:2 + len(PowerUpType)] = 0
+        for power_up in state.active_power_ups:
+            remaining = power_up.duration - (state.tick - power_up.start_tick)
+            slot = 1 + power_up.type.value
+            features[slot] = max(features[slot], remaining)
+        features[-1] = state.time_remaining
+
+
+gymnasium.register(id="Snake-v0", entry_point="snake_env:SnakeEnv")
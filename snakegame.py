@@ -1,15 +1,23 @@
 import pygame
-import pygame.mixer
-import random
 import json
 import os
+import re
+import sys
+import threading
 import time
+from collections import OrderedDict, deque
 from enum import Enum
-from pathlib import Path
-
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+from engine import (Engine, GameMode, PowerUp, PowerUpType, Direction, GameEvent, ItemKind,
+                    OBSTACLE_MODES, OPPOSITE_DIRECTIONS, SOLO_MODES)
+from replay import ReplayRecorder
+from leaderboard import Leaderboard
+import persistence
+from persistence import BackgroundWriter, atomic_write
+from achievements import AchievementTracker, create_achievements
+from audio import AudioEngine
+from autopilot import Autopilot
+from levels import cached_level, load_level
+from profiler import Profiler
 
 # Define Enums
 class GameState(Enum):
@@ -19,16 +27,7 @@ class GameState(Enum):
     LEADERBOARD = 4
     GAME_OVER = 5
     ACHIEVEMENTS = 6
-
-class GameMode(Enum):
-    CLASSIC = 1
-    TIME_TRIAL = 2
-    OBSTACLES = 3
-
-class PowerUpType(Enum):
-    SPEED = 1
-    DOUBLE_SCORE = 2
-    SHIELD = 3
+    LOADING = 7
 
 # Define Colors
 BLACK = (0, 0, 0)
@@ -40,52 +39,108 @@ GRAY = (128, 128, 128)
 YELLOW = (255, 255, 0)
 PURPLE = (128, 0, 128)
 
+KEY_DIRECTIONS = {
+    pygame.K_LEFT: Direction.LEFT,
+    pygame.K_RIGHT: Direction.RIGHT,
+    pygame.K_UP: Direction.UP,
+    pygame.K_DOWN: Direction.DOWN
+}
+
+# Posted by the level generator thread when a level is ready
+LEVEL_READY = pygame.event.custom_type()
+
+# Simulation steps a single frame may catch up before the backlog is dropped
+MAX_STEPS_PER_FRAME = 5
+
+# Seconds between refreshes of the profiler overlay
+PROFILER_OVERLAY_REFRESH = 0.25
+
+# Board cells per side of a cached background tile, and tiles kept cached
+TILE_CELLS = 16
+MAX_CACHED_TILES = 64
+
+POWER_UP_COLORS = {
+    PowerUpType.SPEED: BLUE,
+    PowerUpType.DOUBLE_SCORE: YELLOW,
+    PowerUpType.SHIELD: PURPLE
+}
+
 # Define Classes
-class PowerUp:
-    def __init__(self, type, position):
-        self.type = type
-        self.position = position
-        self.duration = 5
-        self.start_time = None
-        self.active = False
-        self.color = self.get_color()
-    
-    def get_color(self):
-        colors = {
-            PowerUpType.SPEED: BLUE,
-            PowerUpType.DOUBLE_SCORE: YELLOW,
-            PowerUpType.SHIELD: PURPLE
-        }
-        return colors.get(self.type, WHITE)
-
-    def activate(self):
-        self.active = True
-        self.start_time = time.time()
-
-    def is_expired(self):
-        if not self.active:
-            return False
-        return time.time() - self.start_time > self.duration
-
-class Achievement:
-    def __init__(self, name, description, condition):
-        self.name = name
-        self.description = description
-        self.unlocked = False
-        self.condition = condition
+class TextCache:
+    # LRU of rendered text surfaces keyed by (font, text, color)
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.render_text(font, text, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def render_text(self, font, text, color):
+        return font.render(text, True, color)
+
+class GlyphAtlas:
+    # Digits rendered once, so changing HUD numbers reuse the same surfaces
+    def __init__(self, font, color, text_cache):
+        self.font = font
+        self.color = color
+        self.text_cache = text_cache
+        self.digits = {digit: font.render(digit, True, color) for digit in "0123456789"}
+
+    def draw(self, surface, text, center=None, topright=None):
+        pieces = []
+        for run in re.findall(r"\d+|\D+", text):
+            if run[0].isdigit():
+                pieces.extend(self.digits[digit] for digit in run)
+            else:
+                pieces.append(self.text_cache.render(self.font, run, self.color))
+
+        width = sum(piece.get_width() for piece in pieces)
+        height = max(piece.get_height() for piece in pieces)
+        rect = pygame.Rect(0, 0, width, height)
+        if topright is None:
+            rect.center = center
+        else:
+            rect.topright = topright
+        x = rect.left
+        for piece in pieces:
+            surface.blit(piece, (x, rect.top))
+            x += piece.get_width()
+        return rect
 
 class Settings:
-    def __init__(self):
+    def __init__(self, writer=None):
+        self.writer = writer
         self.width = 800
         self.height = 600
         self.snake_block = 20
+        # Board size in cells; None fits the board to the window
+        self.grid_cols = None
+        self.grid_rows = None
         self.snake_speed = 15
         self.difficulty = "Normal"
         self.fps = 60
         self.game_mode = GameMode.CLASSIC
+        # OBSTACLES mode level; a density of 0 drops a few random blocks instead
+        self.level_pattern = 'walls'
+        self.level_density = 0.08
+        self.level_seed = 1
+        self.player_name = "Player"
         
         self.load_settings()
 
+    def grid_size(self):
+        return (self.grid_cols or self.width // self.snake_block,
+                self.grid_rows or self.height // self.snake_block)
+
     def load_settings(self):
         if os.path.exists('settings.json'):
             with open('settings.json', 'r') as f:
@@ -94,49 +149,103 @@ class Settings:
                     self.snake_speed = data.get('speed', 15)
                     self.difficulty = data.get('difficulty', "Normal")
                     self.game_mode = GameMode[data.get('game_mode', "CLASSIC")]
+                    self.player_name = data.get('player', "Player")
+                    self.width = data.get('width', 800)
+                    self.height = data.get('height', 600)
+                    self.snake_block = data.get('block', 20)
+                    self.grid_cols = data.get('cols')
+                    self.grid_rows = data.get('rows')
+                    self.level_pattern = data.get('level_pattern', 'walls')
+                    self.level_density = data.get('level_density', 0.08)
+                    self.level_seed = data.get('level_seed', 1)
                 except:
                     pass
 
     def save_settings(self):
-        with open('settings.json', 'w') as f:
-            json.dump({
-                'speed': self.snake_speed,
-                'difficulty': self.difficulty,
-                'game_mode': self.game_mode.name
-            }, f)
+        data = json.dumps({
+            'speed': self.snake_speed,
+            'difficulty': self.difficulty,
+            'game_mode': self.game_mode.name,
+            'player': self.player_name,
+            'width': self.width,
+            'height': self.height,
+            'block': self.snake_block,
+            'cols': self.grid_cols,
+            'rows': self.grid_rows,
+            'level_pattern': self.level_pattern,
+            'level_density': self.level_density,
+            'level_seed': self.level_seed
+        })
+        if self.writer:
+            self.writer.write_file('settings.json', data)
+        else:
+            atomic_write('settings.json', data)
 
 class Game:
-    def __init__(self):
+    def __init__(self, audio_enabled=True, profile=False):
         # Basic setup
-        self.settings = Settings()
+        self.writer = BackgroundWriter()
+        self.settings = Settings(self.writer)
         self.width = self.settings.width
         self.height = self.settings.height
+        # Only the pygame modules the game uses; audio starts in AudioEngine
+        pygame.display.init()
+        pygame.font.init()
         self.window = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("Snake Game")
         
         # Initialize state and scores
         self.state = GameState.MENU
-        self.scores = self.load_scores()
-        self.current_score = 0
+        self.leaderboard = Leaderboard(writer=self.writer, background=True)
+        self.leaderboard_mode = None
         
-        # Game mode specific variables
-        self.time_remaining = 60
-        self.obstacles = []
-        self.game_start_time = None
-        
-        # Power-up system
-        self.current_power_up = None
-        self.active_power_ups = []
-        self.power_up_spawn_timer = 0
+        # Simulation engine (created per run in reset_game)
+        self.engine = None
+        self.sim = None
+        self.recorder = None
+        self.autopilot = None
+        self.autopilot_enabled = False
+        # Set once the autopilot drives any part of a run: the run then earns
+        # no achievements and is not saved as the player's score
+        self.assisted = False
         self.power_up_spawn_interval = 10
+
+        # Incremental renderer: the camera's top-left cell and visible size,
+        # cached background/obstacle tiles, changed rects and HUD text
+        self.camera = (0, 0)
+        self.view_size = (0, 0)
+        self.tiles = OrderedDict()
+        self.tile_obstacles = {}
+        self.tile_source = None
+        self.full_redraw = True
+        self.dirty_rects = []
+        self.hud = {}
+
+        # Fixed-timestep loop: unsimulated time, buffered turns and the
+        # cells changed or animating since the last rendered frame
+        self.accumulator = 0.0
+        self.input_queue = deque(maxlen=3)
+        self.pending_cells = []
+        self.moving_head = None
+        self.vacated_tail = None
+        self.motion_alpha = 1.0
+
+        # Idle screens block on input; set a timeout (ms) for animated ones
+        self.screen_timeout = None
         
         # Achievement system
-        self.achievements = self.initialize_achievements()
+        self.achievements = create_achievements()
+        self.load_achievements()
+        self.achievement_tracker = AchievementTracker(self.achievements,
+                                                      on_unlock=self.on_achievement_unlocked)
         
-        # Clock and font setup
+        # Clock and font setup (the bundled default font, no system font scan)
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont(None, 50)
-        self.small_font = pygame.font.SysFont(None, 30)
+        self.font = pygame.font.Font(None, 50)
+        self.small_font = pygame.font.Font(None, 30)
+        self.text_cache = TextCache()
+        self.hud_atlas = GlyphAtlas(self.font, WHITE, self.text_cache)
+        self.profiler_atlas = GlyphAtlas(self.small_font, WHITE, self.text_cache)
         
         # Text setup
         self.title_text = self.font.render("SNAKE GAME", True, GREEN)
@@ -144,218 +253,476 @@ class Game:
         self.game_over_text = self.font.render("GAME OVER!", True, RED)
         self.game_over_rect = self.game_over_text.get_rect(center=(self.width/2, self.height/4))
         
-        # Load sounds
-        self.load_sounds()
+        # Sounds decode in the background; pass audio_enabled=False for headless runs
+        self.audio = AudioEngine(enabled=audio_enabled)
+
+        # Per-phase timings: F3 shows the overlay, F4 records to profiles/
+        self.profiler = Profiler()
+        self.profiler_overlay = False
+        self.profiler_panel = None
+        self.profiler_panel_time = 0.0
+        self.hook_profiler()
+        if profile:
+            self.profiler.start_recording()
         
+        # Levels that are not cached yet are generated on a worker thread
+        # when a run starts, behind the loading screen
+        self.levels_generating = set()
+
         # Initialize game state
-        self.reset_game ()
+        self.reset_game(generate=False)
 
-    def load_sounds(self):
-        try:
-            sound_dir = Path("C:\\Users\\suraa\\.vscode\\.vscode\\assets")
-            self.eat_sound = pygame.mixer.Sound("C:\\Users\\suraa\\.vscode\\.vscode\\assets\\eat.wav")
-            self.die_sound = pygame.mixer.Sound("C:\\Users\\suraa\\.vscode\\.vscode\\assets\\die.wav")
-            self.highscore_sound = pygame.mixer.Sound("C:\\Users\\suraa\\.vscode\\.vscode\\assets\\highscore.wav")
-            
-            # Set volume
-            self.eat_sound.set_volume(0.75)
-            self.die_sound.set_volume(0.75)
-            self.highscore_sound.set_volume(0.75)
-            print("Sound files loaded successfully")
-        except Exception as e:
-            print(f"Warning: Sound files not found - {str(e)}")
-            self.eat_sound = None
-            self.die_sound = None
-            self.highscore_sound = None
-
-    def initialize_achievements(self):
-        return {
-            'Speed Demon': Achievement('Speed Demon', 'Score 100 points in under 60 seconds', 
-                                    lambda score, time: score >= 100 and time <= 60),
-            'Snake Master': Achievement('Snake Master', 'Reach a length of 20', 
-                                     lambda length: length >= 20),
-            'Power Player': Achievement('Power Player', 'Collect 5 power-ups', 
-                                     lambda power_ups: power_ups >= 5),
-            'High Scorer': Achievement('High Scorer', 'Score 500 points', 
-                                    lambda score: score >= 500)
-        }
-
-    def load_scores(self):
-        if os.path.exists('scores.json'):
-            with open('scores.json', 'r') as f:
+    def load_achievements(self):
+        if os.path.exists('achievements.json'):
+            with open('achievements.json', 'r') as f:
                 try:
-                    scores = json.load(f)
-                    return scores if isinstance(scores, list) else []
+                    unlocked = json.load(f)
+                    for name in unlocked:
+                        if name in self.achievements:
+                            self.achievements[name].unlocked = True
                 except:
-                    return []
-        return []
+                    pass
+
+    def on_achievement_unlocked(self, achievement):
+        self.audio.play('win')
+        self.save_achievements()
+
+    def save_achievements(self):
+        unlocked = [a.name for a in self.achievements.values() if a.unlocked]
+        self.writer.write_file('achievements.json', json.dumps(unlocked))
 
     def save_score(self, score):
-        if not isinstance(self.scores, list):
-            self.scores = []
-        
-        is_high_score = not self.scores or score > max(self.scores)
-        
-        self.scores.append(score)
-        self.scores.sort(reverse=True)
-        self.scores = self.scores[:10]
+        best = self.leaderboard.best()
+        self.leaderboard.add(self.settings.player_name, self.settings.game_mode, score,
+                             duration=self.engine.elapsed(self.sim))
         
-        if is_high_score and self.highscore_sound:
-            try:
-                self.highscore_sound.play()
-            except:
-                print("Error playing highscore sound")
-        
-        with open('scores.json', 'w') as f:
-            json.dump(self.scores, f)
+        if best is None or score > best:
+            self.audio.play('highscore')
+
+    def hook_profiler(self):
+        hook = self.profiler.hook
+        hook(pygame.event, 'get', 'input')
+        hook(self, 'choose_action', 'input')
+        hook(self.achievement_tracker, 'on_game_event', 'achievements')
+        hook(self, 'draw_game', 'draw')
+        hook(self, 'draw_changes', 'draw')
+        hook(pygame.display, 'flip', 'flip')
+        hook(pygame.display, 'update', 'flip')
+        hook(self, 'wait_for_frame', 'tick_wait')
+        hook(self.text_cache, 'render_text', 'font_render')
+        hook(persistence, 'atomic_write', 'file_io')
+        hook(persistence, 'append_lines', 'file_io')
+
+    def hook_engine(self, old_engine):
+        if old_engine:
+            self.profiler.unhook(old_engine)
+        hook = self.profiler.hook
+        hook(self.engine, 'move', 'movement')
+        hook(self.engine, 'advance_body', 'movement')
+        hook(self.engine, 'check_obstacle_collision', 'collision')
+        hook(self.engine, 'check_self_collision', 'collision')
+        hook(self.engine, 'handle_power_ups', 'power_ups')
+
+    def toggle_profiler_overlay(self):
+        self.profiler_overlay = not self.profiler_overlay
+        if self.profiler_overlay:
+            self.profiler.enable()
+        elif not self.profiler.recording:
+            self.profiler.disable()
+        self.profiler_panel = None
+        self.full_redraw = True
+
+    def toggle_profiler_recording(self):
+        if self.profiler.recording:
+            self.save_profile()
+            if not self.profiler_overlay:
+                self.profiler.disable()
+        else:
+            self.profiler.start_recording()
+
+    def save_profile(self):
+        self.profiler.stop_recording()
+        try:
+            os.makedirs('profiles', exist_ok=True)
+            name = os.path.join('profiles', time.strftime("%Y%m%d-%H%M%S"))
+            self.writer.write_file(name + ".csv", self.profiler.to_csv())
+            self.writer.write_file(name + ".trace.json", self.profiler.to_chrome_trace())
+        except OSError as e:
+            print(f"Error saving profile: {str(e)}")
+
+    def save_replay(self):
+        try:
+            os.makedirs('replays', exist_ok=True)
+            name = time.strftime("%Y%m%d-%H%M%S") + f"-{self.engine.seed}.snkr"
+            self.writer.write_file(os.path.join('replays', name), self.recorder.to_bytes())
+        except OSError as e:
+            print(f"Error saving replay: {str(e)}")
+
+    def cycle_leaderboard_mode(self, step):
+        modes = [None] + SOLO_MODES
+        index = modes.index(self.leaderboard_mode)
+        self.leaderboard_mode = modes[(index + step) % len(modes)]
 
     def draw_leaderboard(self):
         self.window.fill(BLACK)
         self.draw_text("LEADERBOARD", GREEN, self.width/2, 50)
+        mode_name = self.leaderboard_mode.name if self.leaderboard_mode else "ALL MODES"
+        desc_surface = self.text_cache.render(self.small_font, f"< {mode_name} >", GRAY)
+        self.window.blit(desc_surface, desc_surface.get_rect(center=(self.width/2, 95)))
         
-        if not self.scores:
+        records = self.leaderboard.top(10, self.leaderboard_mode)
+        if not records:
             self.draw_text("No scores yet!", WHITE, self.width/2, self.height/2)
         else:
-            for i, score in enumerate(self.scores[:10]):
-                self.draw_text(f"#{i+1}: {score}", WHITE, self.width/2, 150 + i*40)
+            for i, record in enumerate(records):
+                self.draw_text(f"#{i+1}: {record.player} {record.score}", WHITE, self.width/2, 140 + i*40)
         
         self.draw_text("Press BACKSPACE to return", WHITE, self.width/2, 550)
         pygame.display.flip()
 
     def draw_text(self, text, color, x, y):
-        text_surface = self.font.render(text, True, color)
+        text_surface = self.text_cache.render(self.font, text, color)
         text_rect = text_surface.get_rect(center=(x, y))
         self.window.blit(text_surface, text_rect)
+        return text_rect
+
+    def cell_rect(self, cell, origin=None):
+        # Screen rect of a board cell, relative to the camera by default
+        ox, oy = origin or self.camera
+        block = self.settings.snake_block
+        return pygame.Rect((cell[0] - ox) * block, (cell[1] - oy) * block, block, block)
 
-    def wrap_position(self, pos, bound):
-        if pos >= bound:
-            return 0
-        elif pos < 0:
-            return bound - self.settings.snake_block
-        return pos
+    def is_visible(self, cell):
+        cx, cy = self.camera
+        return 0 <= cell[0] - cx < self.view_size[0] and 0 <= cell[1] - cy < self.view_size[1]
+
+    def draw_cell(self, color, cell, surface=None, origin=None):
+        pygame.draw.rect(surface or self.window, color, self.cell_rect(cell, origin))
 
     def draw_snake(self):
-        for x in self.snake_list:
-            pygame.draw.rect(self.window, GREEN, [x[0], x[1], 
-                                                self.settings.snake_block, 
-                                                self.settings.snake_block])
-
-    def handle_time_trial(self):
-        if self.game_start_time is None:
-            self.game_start_time = time.time()
-        
-        elapsed_time = time.time() - self.game_start_time
-        remaining_time = max(0, self.time_remaining - elapsed_time)
-        
-        if remaining_time <= 0:
-            self.save_score(self.current_score)
-            self.state = GameState.GAME_OVER
-            return True
-        
-        self.draw_text(f"Time: {int(remaining_time)}s", WHITE, self.width - 70, 20)
-        return False
+        # Scan the visible cells rather than the body, which may be far longer
+        occupancy = self.sim.occupancy
+        cols = self.engine.cols
+        cx, cy = self.camera
+        view_cols, view_rows = self.view_size
+        for y in range(cy, cy + view_rows):
+            start = y * cols + cx
+            for offset, count in enumerate(occupancy[start:start + view_cols]):
+                if count:
+                    self.draw_cell(GREEN, (cx + offset, y))
 
-    def generate_obstacles(self):
-        self.obstacles = []
-        for _ in range(5):
-            x = round(random.randrange(0, self.width - self.settings.snake_block) / 20.0) * 20.0
-            y = round(random.randrange(0, self.height - self.settings.snake_block) / 20.0) * 20.0
-            self.obstacles.append((x, y))
-
-    def draw_obstacles(self ):
-        for obstacle in self.obstacles:
-            pygame.draw.rect(self.window, GRAY, 
-                           [obstacle[0], obstacle[1], 
-                            self.settings.snake_block, self.settings.snake_block])
-
-    def check_obstacle_collision(self):
-        for obstacle in self.obstacles:
-            if abs(self.x1 - obstacle[0]) < self.settings .snake_block and \
-               abs(self.y1 - obstacle[1]) < self.settings.snake_block:
-                return True
-        return False
+    def draw_obstacles(self, surface=None, origin=None, cells=None):
+        for obstacle in self.sim.obstacles if cells is None else cells:
+            self.draw_cell(GRAY, obstacle, surface, origin)
 
-    def handle_game(self):
-        if self.game_start_time is None:
-            self.game_start_time = time.time()
+    def reset_tiles(self):
+        self.tiles.clear()
+        self.tile_obstacles = {}
+        self.tile_source = self.sim.obstacles
+        for x, y in self.sim.obstacles:
+            self.tile_obstacles.setdefault((x // TILE_CELLS, y // TILE_CELLS), []).append((x, y))
 
-        keys = pygame.key.get_pressed()
-        
-        if keys[pygame.K_LEFT] and self.x1_change <= 0:
-            self.x1_change = -self.settings.snake_block
-            self.y1_change = 0
-        elif keys[pygame.K_RIGHT] and self.x1_change >= 0:
-            self.x1_change = self.settings.snake_block
-            self.y1_change = 0
-        elif keys[pygame.K_UP] and self.y1_change <= 0:
-            self.y1_change = -self.settings.snake_block
-            self.x1_change = 0
-        elif keys[pygame.K_DOWN] and self.y1_change >= 0:
-            self.y1_change = self.settings.snake_block
-            self.x1_change = 0
-
-        self.x1 = self.wrap_position(self.x1 + self.x1_change, self.width)
-        self.y1 = self.wrap_position(self.y1 + self.y1_change, self.height)
+    def tile(self, key):
+        # Background and obstacles for one TILE_CELLS square, built on first view
+        surface = self.tiles.get(key)
+        if surface is not None:
+            self.tiles.move_to_end(key)
+            return surface
+        size = TILE_CELLS * self.settings.snake_block
+        surface = pygame.Surface((size, size)).convert()
+        surface.fill(BLACK)
+        origin = (key[0] * TILE_CELLS, key[1] * TILE_CELLS)
+        self.draw_obstacles(surface, origin, self.tile_obstacles.get(key, ()))
+        self.tiles[key] = surface
+        if len(self.tiles) > MAX_CACHED_TILES:
+            self.tiles.popitem(last=False)
+        return surface
 
+    def blit_static(self, rect):
+        # Restore the background under a screen rect from the cached tiles
+        if self.tile_source is not self.sim.obstacles:
+            self.reset_tiles()
+        block = self.settings.snake_block
+        tile_size = TILE_CELLS * block
+        cx, cy = self.camera
+        left = (cx * block + rect.left) // tile_size
+        top = (cy * block + rect.top) // tile_size
+        right = min((cx * block + rect.right - 1) // tile_size,
+                    (self.engine.cols - 1) // TILE_CELLS)
+        bottom = min((cy * block + rect.bottom - 1) // tile_size,
+                     (self.engine.rows - 1) // TILE_CELLS)
+        self.window.set_clip(rect)
         self.window.fill(BLACK)
-        
-        if self.settings.game_mode == GameMode.TIME_TRIAL:
-            if self.handle_time_trial():
-                return
-        elif self.settings.game_mode == GameMode.OBSTACLES:
-            self.draw_obstacles()
-            if self.check_obstacle_collision():
-                if not any(p.type == PowerUpType.SHIELD and p.active for p in self.active_power_ups):
-                    if self.die_sound:
-                        try:
-                            self.die_sound.play()
-                        except:
-                            print("Error playing die sound")
-                    self.save_score(self.current_score)
-                    self.state = GameState.GAME_OVER
-                    return
-
-        pygame.draw.rect(self.window, RED, [self.foodx, self.foody, 
-                                          self.settings.snake_block, self.settings.snake_block])
-        self.handle_power_ups()
-
-        snake_head = [self.x1, self.y1]
-        self.snake_list.append(snake_head)
-
-        if len(self.snake_list) > self.length_of_snake:
-            del self.snake_list[0]
-
-        for segment in self.snake_list[:-1]:
-            if segment == snake_head:
-                if not any(p.type == PowerUpType.SHIELD and p.active for p in self.active_power_ups):
-                    if self.die_sound:
-                        try:
-                            self.die_sound.play()
-                        except:
-                            print("Error playing die sound")
-                    self.save_score(self.current_score)
-                    self.state = GameState.GAME_OVER
-                    return
+        for tx in range(left, right + 1):
+            for ty in range(top, bottom + 1):
+                self.window.blit(self.tile((tx, ty)),
+                                 (tx * tile_size - cx * block, ty * tile_size - cy * block))
+        self.window.set_clip(None)
+
+    def update_camera(self):
+        # Keep the head out of the outer quarter of the view; the whole
+        # frame is redrawn when the camera moves
+        view_cols, view_rows = self.view_size
+        cx, cy = self.camera
+        x, y = self.sim.head
+        cx = self.follow(cx, x, view_cols, self.engine.cols)
+        cy = self.follow(cy, y, view_rows, self.engine.rows)
+        if (cx, cy) != self.camera:
+            self.camera = (cx, cy)
+            self.full_redraw = True
+
+    def follow(self, start, position, view, size):
+        margin = view // 4
+        if position < start + margin:
+            start = position - margin
+        elif position >= start + view - margin:
+            start = position - view + margin + 1
+        return max(0, min(start, size - view))
+
+    def cell_color(self, cell):
+        # Dynamic contents of a cell, drawn over the static layer
+        if self.sim.occupancy[self.engine.cell_index(cell)]:
+            return GREEN
+        item = self.sim.items.get(self.engine.cell_index(cell))
+        if item is ItemKind.FOOD:
+            return RED
+        if isinstance(item, PowerUp):
+            return POWER_UP_COLORS[item.type]
+        return None
+
+    def paint_cell(self, cell):
+        if not self.is_visible(cell):
+            return
+        rect = self.cell_rect(cell)
+        self.blit_static(rect)
+        color = self.cell_color(cell)
+        if color:
+            pygame.draw.rect(self.window, color, rect)
+        self.dirty_rects.append(rect)
+
+    def repaint_area(self, rect):
+        rect = rect.clip(self.window.get_rect())
+        self.blit_static(rect)
+        block = self.settings.snake_block
+        cx, cy = self.camera
+        for x in range(rect.left // block, (rect.right - 1) // block + 1):
+            for y in range(rect.top // block, (rect.bottom - 1) // block + 1):
+                cell = (cx + x, cy + y)
+                if self.is_visible(cell) and not self.paint_motion(cell, self.cell_rect(cell)):
+                    color = self.cell_color(cell)
+                    if color:
+                        self.draw_cell(color, cell)
+        self.dirty_rects.append(rect)
+
+    def queue_input(self, direction):
+        if not self.input_queue or self.input_queue[-1] != direction:
+            self.input_queue.append(direction)
+
+    def read_input(self):
+        # One buffered turn per simulation step, so quick taps are not lost
+        return self.input_queue.popleft() if self.input_queue else None
+
+    def on_game_event(self, event, sim):
+        if event == GameEvent.FOOD_EATEN:
+            self.audio.play('eat')
+        elif event == GameEvent.DIED:
+            self.audio.play('die')
+            self.end_run(sim)
+        elif event == GameEvent.TIME_UP:
+            self.audio.play('draw')
+            self.end_run(sim)
+
+    def end_run(self, sim):
+        if not self.assisted:
+            self.save_score(sim.score)
+        self.state = GameState.GAME_OVER
+
+    def toggle_autopilot(self):
+        self.autopilot_enabled = not self.autopilot_enabled
+        if self.autopilot_enabled and not self.assisted:
+            self.assisted = True
+            self.achievement_tracker.stop_run()
+
+    def draw_profiler_overlay(self):
+        now = time.perf_counter()
+        if self.profiler_panel is None or now - self.profiler_panel_time > PROFILER_OVERLAY_REFRESH:
+            rows = self.profiler.overlay_rows()
+            line_height = self.small_font.get_linesize()
+            panel = pygame.Surface((230, line_height * len(rows) + 10)).convert()
+            panel.fill((24, 24, 24))
+            for i, row in enumerate(rows):
+                y = 5 + i * line_height
+                panel.blit(self.text_cache.render(self.small_font, row[0], WHITE), (8, y))
+                # Figures change every refresh, so they are drawn from the digit atlas
+                for text, right in zip(row[1:], (160, 222)):
+                    self.profiler_atlas.draw(panel, text, topright=(right, y))
+            self.profiler_panel = panel
+            self.profiler_panel_time = now
+
+        drawn = self.hud.get('profiler')
+        if drawn and drawn[0] is self.profiler_panel and drawn[1].collidelist(self.dirty_rects) == -1:
+            return
+        if drawn:
+            self.repaint_area(drawn[1])
+        rect = self.window.blit(self.profiler_panel, (10, 40))
+        self.dirty_rects.append(rect)
+        self.hud['profiler'] = (self.profiler_panel, rect)
+
+    def draw_hud(self):
+        items = [('score', f"Score: {self.sim.score}", 70, 20)]
+        if self.engine.game_mode == GameMode.TIME_TRIAL:
+            items.append(('time', f"Time: {int(self.sim.time_remaining)}s", self.width - 70, 20))
+
+        for key, text, x, y in items:
+            drawn = self.hud.get(key)
+            # Redraw when the text changes or a cell was repainted underneath it
+            if drawn and drawn[0] == text and drawn[1].collidelist(self.dirty_rects) == -1:
+                continue
+            if drawn:
+                self.repaint_area(drawn[1])
+            rect = self.hud_atlas.draw(self.window, text, (x, y))
+            self.dirty_rects.append(rect)
+            self.hud[key] = (text, rect)
+
+        if self.profiler_overlay:
+            self.draw_profiler_overlay()
+
+    def partial_rect(self, rect, direction, fraction):
+        # The part of a cell covered when entering it moving in direction
+        size = int(self.settings.snake_block * fraction)
+        if direction == Direction.RIGHT:
+            return pygame.Rect(rect.left, rect.top, size, rect.height)
+        elif direction == Direction.LEFT:
+            return pygame.Rect(rect.right - size, rect.top, size, rect.height)
+        elif direction == Direction.DOWN:
+            return pygame.Rect(rect.left, rect.top, rect.width, size)
+        return pygame.Rect(rect.left, rect.bottom - size, rect.width, size)
+
+    def paint_motion(self, cell, rect):
+        # Draw an animating cell over its background at the current
+        # interpolation; False if the cell is not animating
+        if self.moving_head and cell == self.moving_head[0]:
+            if self.sim.occupancy[self.engine.cell_index(cell)] != 1:
+                return False
+            pygame.draw.rect(self.window, GREEN,
+                             self.partial_rect(rect, self.moving_head[1], self.motion_alpha))
+            return True
+        if self.vacated_tail and cell == self.vacated_tail[0]:
+            color = self.cell_color(cell)
+            if color:
+                pygame.draw.rect(self.window, color, rect)
+            pygame.draw.rect(self.window, GREEN,
+                             self.partial_rect(rect, OPPOSITE_DIRECTIONS[self.vacated_tail[1]],
+                                               1 - self.motion_alpha))
+            return True
+        return False
+
+    def draw_motion(self, alpha):
+        # Interpolate between ticks: the head slides in, the old tail slides out
+        self.motion_alpha = alpha
+        for motion in (self.moving_head, self.vacated_tail):
+            if motion and self.is_visible(motion[0]):
+                rect = self.cell_rect(motion[0])
+                self.blit_static(rect)
+                if not self.paint_motion(motion[0], rect):
+                    color = self.cell_color(motion[0])
+                    if color:
+                        pygame.draw.rect(self.window, color, rect)
+                self.dirty_rects.append(rect)
+
+    def draw_game(self, alpha=1.0):
+        self.blit_static(self.window.get_rect())
+
+        for food in self.sim.foods:
+            if self.is_visible(food):
+                self.draw_cell(RED, food)
+        for power_up in self.sim.power_ups:
+            if self.is_visible(power_up.position):
+                self.draw_cell(POWER_UP_COLORS[power_up.type], power_up.position)
 
         self.draw_snake()
-        self.draw_text(f"Score: {self.current_score}", WHITE, 70, 20)
-
-        if abs(self.x1 - self.foodx) < self.settings.snake_block and \
-           abs(self.y1 - self.foody) < self.settings.snake_block:
-            self.foodx = round(random.randrange(0, self.width - self.settings.snake_block) / 20.0) * 20.0
-            self.foody = round(random.randrange(0, self.height - self.settings.snake_block) / 20.0) * 20.0
-            self.length_of_snake += 1
-            self.current_score += 10
-            if self.eat_sound:
-                try:
-                    self.eat_sound.play()
-                except:
-                    print("Error playing eat sound")
+        self.hud = {}
+        self.dirty_rects = []
+        self.draw_motion(alpha)
+        self.draw_hud()
 
-        self.check_achievements()
+    def draw_changes(self, alpha=1.0):
+        self.dirty_rects = []
+        for cell in self.pending_cells:
+            self.paint_cell(cell)
+        self.draw_motion(alpha)
+        self.draw_hud()
 
-        pygame.display.flip()
-        self.clock.tick(self.settings.snake_speed)
+    def track_motion(self, old_head, old_tail):
+        sim = self.sim
+        self.moving_head = None
+        self.vacated_tail = None
+        if sim.direction is None or sim.head == old_head:
+            return
+        self.moving_head = (sim.head, sim.direction)
+        if sim.occupancy[self.engine.cell_index(old_tail)] == 0:
+            self.vacated_tail = (old_tail, self.engine.direction_between(old_tail, sim.snake_list[0]))
+
+    def choose_action(self):
+        if self.autopilot_enabled:
+            if self.autopilot is None:
+                # Built on first use; only its search buffers grow with the board
+                self.autopilot = Autopilot(self.engine)
+            return self.autopilot.choose(self.sim)
+        return self.read_input()
+
+    def wait_for_frame(self):
+        return self.clock.tick(self.settings.fps)
+
+    def step_game(self):
+        old_head, old_tail = self.sim.head, self.sim.snake_list[0]
+        old_direction = self.sim.direction
+        # Cells animated during the last tick get fully repainted
+        for motion in (self.moving_head, self.vacated_tail):
+            if motion:
+                self.pending_cells.append(motion[0])
+
+        self.engine.step(self.sim, self.choose_action())
+        self.recorder.record(self.sim)
+        if self.sim.direction != old_direction:
+            self.audio.play('move')
+        self.pending_cells.extend(self.sim.changed_cells)
+        if self.state != GameState.PLAYING:
+            self.save_replay()
+            return
+
+        self.track_motion(old_head, old_tail)
+
+    def render_game(self, alpha):
+        self.update_camera()
+        if self.full_redraw:
+            self.draw_game(alpha)
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            self.draw_changes(alpha)
+            pygame.display.update(self.dirty_rects)
+        self.pending_cells = []
+
+    def handle_game(self):
+        # Render at settings.fps and run as many fixed simulation steps
+        # (snake_speed per second) as the elapsed time calls for
+        self.accumulator += self.wait_for_frame() / 1000.0
+        step_time = 1.0 / self.settings.snake_speed
+        steps = 0
+        while self.accumulator >= step_time:
+            if steps == MAX_STEPS_PER_FRAME:
+                self.accumulator = 0.0
+                break
+            self.step_game()
+            if self.state != GameState.PLAYING:
+                return
+            self.accumulator -= step_time
+            steps += 1
+
+        self.render_game(min(1.0, self.accumulator / step_time))
+        if self.profiler.enabled:
+            self.profiler.end_frame()
 
     def draw_menu(self):
         self.window.fill(BLACK)
@@ -370,7 +737,7 @@ class Game:
         self.window.blit(self.title_text, self.title_rect)
         
         for i, option in enumerate(menu_options):
-            text = self.font.render(option, True, WHITE)
+            text = self.text_cache.render(self.font, option, WHITE)
             text_rect = text.get_rect(center=(self.width/2, 250 + i*50))
             self.window.blit(text, text_rect)
         
@@ -384,7 +751,8 @@ class Game:
             "1. Classic Mode",
             "2. Time Trial",
             "3. Obstacles",
-            "4. Back to Menu"
+            "4. Arena",
+            "5. Back to Menu"
         ]
         
         for i, option in enumerate(mode_options):
@@ -410,7 +778,7 @@ class Game:
         for achievement in self.achievements.values():
             color = GREEN if achievement.unlocked else GRAY
             self.draw_text(f"{achievement.name}", color, self.width/2, y_pos)
-            desc_surface = self.small_font.render(achievement.description, True, color)
+            desc_surface = self.text_cache.render(self.small_font, achievement.description, color)
             desc_rect = desc_surface.get_rect(center=(self.width/2, y_pos + 30))
             self.window.blit(desc_surface, desc_rect)
             y_pos += 80
@@ -418,161 +786,219 @@ class Game:
         self.draw_text("Press BACKSPACE to return", WHITE, self.width/2, 550)
         pygame.display.flip()
 
-    def reset_game(self):
+    def show_run(self, engine, sim):
+        # Point the renderer at a run (a fresh game, or a replayed one)
+        self.engine = engine
+        self.sim = sim
+        block = self.settings.snake_block
+        self.view_size = (min(engine.cols, self.width // block), min(engine.rows, self.height // block))
+        self.camera = (0, 0)
+        self.reset_tiles()
+        self.update_camera()
+        self.full_redraw = True
+
+    def render_to(self, surface, alpha=1.0):
+        # Draw a whole frame onto another window-sized surface, such as an
+        # offscreen capture target, instead of the window
+        window = self.window
+        self.window = surface
         try:
-            self.x1 = self.width / 2
-            self.y1 = self.height / 2
-            self.x1_change = 0
-            self.y1_change = 0
-            self.snake_list = []
-            self.length_of_snake = 1
-            self.foodx = round(random.randrange(0, self.width - self.settings.snake_block) / 20.0) * 20.0
-            self.foody = round(random.randrange(0, self.height - self.settings.snake_block) / 20.0) * 20.0
-            self.current_score = 0
-            self.game_start_time = None
-            self.power_up_spawn_timer = time.time()
-            self.current_power_up = None
-            self.active_power_ups = []
-            
-            if self.settings.game_mode == GameMode.OBSTACLES:
-                self.generate_obstacles()
-            elif self.settings.game_mode == GameMode.TIME_TRIAL:
-                self.time_remaining = 60
-        except Exception as e:
-            print(f"Error in reset_game: {str(e)}")
+            self.update_camera()
+            self.draw_game(alpha)
+        finally:
+            self.window = window
+            self.full_redraw = True
+
+    def level_request(self):
+        # load_level arguments for the configured level, or None for random blocks
+        cols, rows = self.settings.grid_size()
+        if self.settings.game_mode in OBSTACLE_MODES and self.settings.level_density:
+            return (cols, rows, self.settings.level_density,
+                    self.settings.level_pattern, self.settings.level_seed)
+        return None
+
+    def current_level(self, generate=True):
+        # Obstacle cells of the configured level, or None for random blocks
+        # (and, unless generate, for a level that was never generated)
+        request = self.level_request()
+        if request is None:
+            return None
+        if not generate:
+            return cached_level(*request)
+        return load_level(*request, writer=self.writer)
 
-    def handle_game_over(self):
+    def start_game(self):
+        # Play now, or show the loading screen while the level is generated
+        request = self.level_request()
+        if request is None or cached_level(*request) is not None:
+            self.reset_game()
+            self.state = GameState.PLAYING
+            return
+        self.state = GameState.LOADING
+        if request not in self.levels_generating:
+            self.levels_generating.add(request)
+            threading.Thread(target=self.generate_level, args=(request,),
+                             name="LevelGenerator", daemon=True).start()
+
+    def generate_level(self, request):
+        failed = False
         try:
-            # Save score first
-            self.save_score(self.current_score)
-            
-            while True:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        quit()
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_SPACE:
-                            self.reset_game()
-                            self.state = GameState.PLAYING
-                            return
-                        elif event.key == pygame.K_m:
-                            self.state = GameState.MENU
-                            return
-                        elif event.key == pygame.K_ESCAPE:
-                            pygame.quit()
-                            quit()
-
-                # Draw game over screen
-                self.window.fill(BLACK)
-                self.window.blit(self.game_over_text, self.game_over_rect)
-                
-                # Draw score
-                self.draw_text(f"Final Score: {self.current_score}", WHITE, self.width/2, self.height/3)
-                
-                # Draw achievements
-                unlocked_achievements = [ach for ach in self.achievements.values() if ach.unlocked]
-                if unlocked_achievements:
-                    y_pos = self.height/2.5
-                    self.draw_text("Achievements Unlocked:", GREEN, self.width/2, y_pos)
-                    for achievement in unlocked_achievements:
-                        y_pos += 30
-                        text = self.small_font.render(achievement.name, True, GREEN)
-                        rect = text.get_rect(center=(self.width/2, y_pos))
-                        self.window.blit(text, rect)
-                
-                # Draw instructions
-                self.draw_text("Press SPACE to Play Again", WHITE, self.width/2, self.height/1.8)
-                self.draw_text("Press M for Main Menu", WHITE, self.width/2, self.height/1.6)
-                self.draw_text("Press ESC to Quit", WHITE, self.width/2, self.height/1.4)
-                
-                pygame.display.flip()
-                self.clock.tick(15)
-                
+            load_level(*request, writer=self.writer)
         except Exception as e:
-            print(f"Error in handle_game_over: {str(e)}")
+            print(f"Error generating level: {str(e)}")
+            failed = True
+        pygame.event.post(pygame.event.Event(LEVEL_READY, request=request, failed=failed))
+
+    def level_generated(self, event):
+        # Carry on if the loading screen is still waiting for this level;
+        # otherwise (after ESC) it just stays cached for the next run
+        self.levels_generating.discard(event.request)
+        if self.state != GameState.LOADING or event.request != self.level_request():
+            return
+        if event.failed:
+            # Play with random obstacles instead
+            self.reset_game(generate=False)
+            self.state = GameState.PLAYING
+        else:
+            self.start_game()
 
+    def create_engine(self, level=None):
+        # An engine for the current settings, with no observers attached
+        cols, rows = self.settings.grid_size()
+        return Engine(cols, rows, self.settings.game_mode,
+                      tick_rate=self.settings.snake_speed,
+                      power_up_spawn_interval=self.power_up_spawn_interval,
+                      level=level)
 
-    def handle_power_ups(self):
-        # Handle existing power-ups
-        for power_up in self.active_power_ups[:]:
-            if power_up.is_expired():
-                self.active_power_ups.remove(power_up)
+    def reset_game(self, generate=True):
+        try:
+            old_engine = self.engine
+            self.engine = self.create_engine(self.current_level(generate))
+            self.hook_engine(old_engine)
+            self.engine.add_observer(self.on_game_event)
+            self.assisted = self.autopilot_enabled
+            if self.assisted:
+                self.achievement_tracker.stop_run()
+            else:
+                self.achievement_tracker.start_run(self.engine)
+            self.sim = self.engine.reset()
+            self.autopilot = None
+            self.recorder = ReplayRecorder(self.engine, self.sim)
+            self.show_run(self.engine, self.sim)
+            self.accumulator = 0.0
+            self.input_queue.clear()
+            self.pending_cells = []
+            self.moving_head = None
+            self.vacated_tail = None
+            self.clock.tick()
+        except Exception as e:
+            print(f"Error in reset_game: {str(e)}")
+
+    def draw_game_over(self):
+        self.window.fill(BLACK)
+        self.window.blit(self.game_over_text, self.game_over_rect)
         
-        # Spawn new power-up
-        current_time = time.time()
-        if (self.current_power_up is None and 
-            current_time - self.power_up_spawn_timer > self.power_up_spawn_interval):
-            
-            # Random chance to spawn power-up
-            if random.random() < 0.3:  # 30% chance
-                power_up_type = random.choice(list(PowerUpType))
-                x = round(random.randrange(0, self.width - self.settings.snake_block) / 20.0) * 20.0
-                y = round(random.randrange(0, self.height - self.settings.snake_block) / 20.0) * 20.0
-                self.current_power_up = PowerUp(power_up_type, (x, y))
+        # Draw score
+        self.draw_text(f"Final Score: {self.sim.score}", WHITE, self.width/2, self.height/3)
+        if self.assisted:
+            self.draw_text("Autopilot run - not recorded", WHITE, self.width/2, self.height/3 + 35)
         
-        # Draw and check collision with current power-up
-        if self.current_power_up:
-            pygame.draw.rect(self.window, 
-                           self.current_power_up.color,
-                           [self.current_power_up.position[0],
-                            self.current_power_up.position[1],
-                            self.settings.snake_block,
-                            self.settings.snake_block])
-            
-            if (abs(self.x1 - self.current_power_up.position[0]) < self.settings.snake_block and
-                abs(self.y1 - self.current_power_up.position[1]) < self.settings.snake_block):
-                
-                self.current_power_up.activate()
-                self.active_power_ups.append(self.current_power_up)
-                self.current_power_up = None
-                self.power_up_spawn_timer = time.time()
-
-    def check_achievements(self):
-        game_time = time.time() - self.game_start_time if self.game_start_time else 0
+        # Draw achievements
+        unlocked_achievements = [ach for ach in self.achievements.values() if ach.unlocked]
+        if unlocked_achievements:
+            y_pos = self.height/2.5
+            self.draw_text("Achievements Unlocked:", GREEN, self.width/2, y_pos)
+            for achievement in unlocked_achievements:
+                y_pos += 30
+                text = self.text_cache.render(self.small_font, achievement.name, GREEN)
+                rect = text.get_rect(center=(self.width/2, y_pos))
+                self.window.blit(text, rect)
         
-        # Check each achievement
-        for achievement in self.achievements.values():
-            if not achievement.unlocked:
-                if achievement.name == 'Speed Demon':
-                    if achievement.condition(self.current_score, game_time):
-                        achievement.unlocked = True
-                
-                elif achievement.name == 'Snake Master':
-                    if achievement.condition(self.length_of_snake):
-                        achievement.unlocked = True
-                
-                elif achievement.name == 'Power Player':
-                    collected_power_ups = len([p for p in self.active_power_ups if p.active])
-                    if achievement.condition(collected_power_ups):
-                        achievement.unlocked = True
-                
-                elif achievement.name == 'High Scorer':
-                    if achievement.condition(self.current_score):
-                        achievement.unlocked = True
+        # Draw instructions
+        self.draw_text("Press SPACE to Play Again", WHITE, self.width/2, self.height/1.8)
+        self.draw_text("Press M for Main Menu", WHITE, self.width/2, self.height/1.6)
+        self.draw_text("Press ESC to Quit", WHITE, self.width/2, self.height/1.4)
+        
+        pygame.display.flip()
+
+    def draw_loading(self):
+        self.window.fill(BLACK)
+        self.draw_text("Generating level...", WHITE, self.width/2, self.height/2)
+        self.draw_text("Press ESC to cancel", WHITE, self.width/2, self.height/1.6)
+        pygame.display.flip()
+
+    def draw_screen(self, game_mode_selection):
+        if game_mode_selection:
+            self.draw_game_mode_selection()
+        elif self.state == GameState.MENU:
+            self.draw_menu()
+        elif self.state == GameState.SETTINGS:
+            self.draw_settings()
+        elif self.state == GameState.LEADERBOARD:
+            self.draw_leaderboard()
+        elif self.state == GameState.ACHIEVEMENTS:
+            self.draw_achievements()
+        elif self.state == GameState.GAME_OVER:
+            self.draw_game_over()
+        elif self.state == GameState.LOADING:
+            self.draw_loading()
+
+    def wait_events(self):
+        # Sleep until input arrives (or the screen's animation timeout passes)
+        if self.screen_timeout is None:
+            event = pygame.event.wait()
+        else:
+            event = pygame.event.wait(self.screen_timeout)
+        return [event] + pygame.event.get()
 
     def run(self):
         running = True
         game_mode_selection = False
+        redraw = True
+        shown_screen = None
         
         try:
             while running:
-                for event in pygame.event.get():
+                screen = (self.state, game_mode_selection)
+                playing = self.state == GameState.PLAYING and not game_mode_selection
+                if playing:
+                    events = pygame.event.get()
+                else:
+                    # Menus are retained: draw once per change, then block on input
+                    if redraw or screen != shown_screen:
+                        self.draw_screen(game_mode_selection)
+                        shown_screen = screen
+                        redraw = False
+                    events = self.wait_events()
+
+                for event in events:
                     if event.type == pygame.QUIT:
                         running = False
+                    elif event.type == LEVEL_READY:
+                        redraw = True
+                        self.level_generated(event)
+                    elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                        redraw = True
+                        self.full_redraw = True
                     elif event.type == pygame.KEYDOWN:
-                        if game_mode_selection:
-                            if event.key in [pygame.K_1, pygame.K_2, pygame.K_3]:
+                        redraw = True
+                        if event.key == pygame.K_F3:
+                            self.toggle_profiler_overlay()
+                        elif event.key == pygame.K_F4:
+                            self.toggle_profiler_recording()
+                        elif game_mode_selection:
+                            if event.key in [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4]:
                                 if event.key == pygame.K_1:
                                     self.settings.game_mode = GameMode.CLASSIC
                                 elif event.key == pygame.K_2:
                                     self.settings.game_mode = GameMode.TIME_TRIAL
                                 elif event.key == pygame.K_3:
                                     self.settings.game_mode = GameMode.OBSTACLES
+                                elif event.key == pygame.K_4:
+                                    self.settings.game_mode = GameMode.ARENA
                                 game_mode_selection = False
-                                self.reset_game()
-                                self.state = GameState.PLAYING
-                            elif event.key == pygame.K_4:
+                                self.start_game()
+                            elif event.key == pygame.K_5:
                                 game_mode_selection = False
                         elif self.state == GameState.MENU:
                             if event.key == pygame.K_1:
@@ -598,40 +1024,62 @@ class Game:
                         elif self.state == GameState.LEADERBOARD:
                             if event.key == pygame.K_BACKSPACE:
                                 self.state = GameState.MENU
+                            elif event.key == pygame.K_LEFT:
+                                self.cycle_leaderboard_mode(-1)
+                            elif event.key == pygame.K_RIGHT:
+                                self.cycle_leaderboard_mode(1)
                         elif self.state == GameState.ACHIEVEMENTS:
                             if event.key == pygame.K_BACKSPACE:
                                 self.state = GameState.MENU
+                        elif self.state == GameState.GAME_OVER:
+                            if event.key == pygame.K_SPACE:
+                                self.start_game()
+                            elif event.key == pygame.K_m:
+                                self.state = GameState.MENU
+                            elif event.key == pygame.K_ESCAPE:
+                                running = False
+                        elif self.state == GameState.LOADING:
+                            if event.key == pygame.K_ESCAPE:
+                                self.state = GameState.MENU
                         elif self.state == GameState.PLAYING:
                             if event.key == pygame.K_ESCAPE:
                                 self.state = GameState.MENU
+                            elif event.key == pygame.K_a:
+                                self.toggle_autopilot()
+                            elif event.key in KEY_DIRECTIONS:
+                                self.queue_input(KEY_DIRECTIONS[event.key])
 
-                if game_mode_selection:
-                    self.draw_game_mode_selection()
-                elif self.state == GameState.MENU:
-                    self.draw_menu()
-                elif self.state == GameState.PLAYING:
+                if running and self.state == GameState.PLAYING and not game_mode_selection:
+                    if not playing and self.profiler.enabled:
+                        # Coming from a menu: its spans are not part of this frame
+                        self.profiler.begin_frame()
                     self.handle_game()
-                elif self.state == GameState.SETTINGS:
-                    self.draw_settings()
-                elif self.state == GameState.LEADERBOARD:
-                    self.draw_leaderboard()
-                elif self.state == GameState.ACHIEVEMENTS:
-                    self.draw_achievements()
-                elif self.state == GameState.GAME_OVER:
-                    self.handle_game_over()
-
-                if self.state != GameState.PLAYING:
-                    self.clock.tick(self.settings.fps)
 
         except Exception as e:
             print(f"Error in game loop: {str(e)}")
         finally:
+            if self.profiler.recording:
+                self.save_profile()
+            self.writer.close()
             pygame.quit()
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["tournament"]:
+        import tournament
+        tournament.main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["capture"]:
+        import capture
+        capture.main(sys.argv[2:])
+        sys.exit()
+    if sys.argv[1:2] == ["server"]:
+        import multiplayer
+        multiplayer.main(["serve"] + sys.argv[2:])
+        sys.exit()
+
     print("Starting Snake Game...")
     try:
-        game = Game()
+        game = Game(profile="--profile" in sys.argv[1:])
         print("Game instance created successfully")
         game.run()
     except Exception as e:
@@ -0,0 +1,165 @@
+"""Headless tournaments across CPU cores.
+
+Plays many seeded games per (mode, bot) pair in a ProcessPoolExecutor and
+aggregates score, length, survival and power-up statistics. Workers receive
+only (settings, seeds) and send back one small summary tuple per game, so
+inter-process traffic stays tiny and throughput scales with cores.
+OBSTACLES and ARENA games play the generated level chosen by the
+``--level-*`` options, like the game; workers read it from the level cache.
+
+    python tournament.py --games 2000 --modes CLASSIC OBSTACLES --bots autopilot
+    python snakegame.py tournament --games 2000      (same entry point)
+"""
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from autopilot import Autopilot
+from engine import OBSTACLE_MODES, SOLO_MODES, Direction, Engine, GameEvent, GameMode
+from levels import PATTERNS, load_level
+
+BOTS = ['autopilot', 'random']
+
+RECORD_FIELDS = ['mode', 'bot', 'seed', 'score', 'length', 'ticks', 'power_ups', 'died']
+
+
+def random_bot(engine, seed):
+    rng = random.Random(seed)
+    directions = list(Direction)
+
+    def choose(state):
+        # Mostly keep going, sometimes turn
+        return rng.choice(directions) if rng.random() < 0.2 else None
+    return choose
+
+
+def make_bot(name, engine, seed):
+    if name == 'autopilot':
+        return Autopilot(engine).choose
+    return random_bot(engine, seed)
+
+
+def level_for(mode, options):
+    # The same generated level the game plays, or None for random obstacles
+    if mode in OBSTACLE_MODES and options['level_density']:
+        return load_level(options['cols'], options['rows'], options['level_density'],
+                          options['level_pattern'], options['level_seed'])
+    return None
+
+
+def play_game(mode, bot_name, seed, options):
+    engine = Engine(options['cols'], options['rows'], mode,
+                    tick_rate=options['speed'],
+                    power_up_spawn_interval=options['power_up_interval'],
+                    obstacle_count=options['obstacles'], level=level_for(mode, options),
+                    seed=seed)
+    state = engine.reset()
+    choose = make_bot(bot_name, engine, seed)
+    power_ups = 0
+    while state.alive and state.tick < options['max_ticks']:
+        engine.step(state, choose(state))
+        if GameEvent.POWER_UP_COLLECTED in state.events:
+            power_ups += 1
+    died = GameEvent.DIED in state.events
+    return (mode.name, bot_name, seed, state.score, state.length_of_snake,
+            state.tick, power_ups, died)
+
+
+def play_chunk(mode_name, bot_name, seeds, options):
+    mode = GameMode[mode_name]
+    return [play_game(mode, bot_name, seed, options) for seed in seeds]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(records):
+    groups = {}
+    for record in records:
+        groups.setdefault((record[0], record[1]), []).append(record)
+
+    header = (f"{'mode':<11}{'bot':<10}{'games':>6}{'mean':>8}{'p10':>6}{'p50':>6}"
+              f"{'p90':>6}{'max':>6}{'length':>8}{'ticks':>8}{'pwr-ups':>8}{'died':>7}")
+    lines = [header]
+    for (mode, bot), group in sorted(groups.items()):
+        scores = sorted(r[3] for r in group)
+        lines.append(
+            f"{mode:<11}{bot:<10}{len(group):>6}{statistics.mean(scores):>8.1f}"
+            f"{percentile(scores, 0.1):>6}{percentile(scores, 0.5):>6}"
+            f"{percentile(scores, 0.9):>6}{scores[-1]:>6}"
+            f"{statistics.mean(r[4] for r in group):>8.1f}"
+            f"{statistics.mean(r[5] for r in group):>8.0f}"
+            f"{statistics.mean(r[6] for r in group):>8.2f}"
+            f"{100 * sum(r[7] for r in group) / len(group):>6.0f}%")
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run headless snake tournaments in parallel.")
+    parser.add_argument('--games', type=int, default=1000, help="games per mode and bot")
+    parser.add_argument('--modes', nargs='+', default=[m.name for m in SOLO_MODES],
+                        choices=[m.name for m in SOLO_MODES])
+    parser.add_argument('--bots', nargs='+', default=['autopilot'], choices=BOTS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk', type=int, default=25, help="games per worker task")
+    parser.add_argument('--seed', type=int, default=0, help="first seed")
+    parser.add_argument('--cols', type=int, default=40)
+    parser.add_argument('--rows', type=int, default=30)
+    parser.add_argument('--speed', type=int, default=15, help="ticks per second")
+    parser.add_argument('--power-up-interval', type=float, default=10)
+    parser.add_argument('--obstacles', type=int, default=5,
+                        help="random obstacles when --level-density is 0")
+    parser.add_argument('--level-pattern', default='walls', choices=PATTERNS)
+    parser.add_argument('--level-density', type=float, default=0.08,
+                        help="obstacle share of generated levels (0 for random obstacles)")
+    parser.add_argument('--level-seed', type=int, default=1)
+    parser.add_argument('--max-ticks', type=int, default=5000)
+    parser.add_argument('--csv', help="also write one row per game to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    options = {
+        'cols': args.cols, 'rows': args.rows, 'speed': args.speed,
+        'power_up_interval': args.power_up_interval, 'obstacles': args.obstacles,
+        'level_pattern': args.level_pattern, 'level_density': args.level_density,
+        'level_seed': args.level_seed, 'max_ticks': args.max_ticks
+    }
+    # Generate the level here once, so workers load it from the cache
+    for mode in args.modes:
+        level_for(GameMode[mode], options)
+
+    records = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = []
+        for mode in args.modes:
+            for bot in args.bots:
+                for first in range(args.seed, args.seed + args.games, args.chunk):
+                    seeds = range(first, min(first + args.chunk, args.seed + args.games))
+                    futures.append(executor.submit(play_chunk, mode, bot, list(seeds), options))
+        for future in as_completed(futures):
+            records.extend(future.result())
+    elapsed = time.perf_counter() - start
+
+    print(summarize(records))
+    total_ticks = sum(r[5] for r in records)
+    print(f"\n{len(records)} games, {total_ticks} ticks in {elapsed:.1f}s "
+          f"({total_ticks / elapsed:,.0f} ticks/s on {args.workers} workers)")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(RECORD_FIELDS)
+            writer.writerows(sorted(records, key=lambda r: (r[0], r[1], r[2])))
+
+
+if __name__ == "__main__":
+    main()